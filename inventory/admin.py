@@ -34,6 +34,9 @@ class ProductMasterAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_stock()
+    
     def current_stock_display(self, obj):
         stock = obj.current_stock
         if stock < obj.minimum_stock_level:
@@ -43,6 +46,7 @@ class ProductMasterAdmin(admin.ModelAdmin):
             )
         return stock
     current_stock_display.short_description = 'Current Stock'
+    current_stock_display.admin_order_field = 'current_stock'
 
 class StockDetailInline(admin.TabularInline):
     model = StockDetail
@@ -55,6 +59,7 @@ class StockDetailInline(admin.TabularInline):
         'total_cost', 
         'lot_batch_number', 
         'location', 
+        'destination_location',
         'remarks'
     ]
 
@@ -146,6 +151,7 @@ class StockDetailAdmin(admin.ModelAdmin):
                 'lot_batch_number', 
                 'expiry_date', 
                 'location', 
+                'destination_location',
                 'remarks'
             )
         }),
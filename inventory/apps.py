@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class InventoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventory'
-    verbose_name = 'Warehouse Inventory Management' 
\ No newline at end of file
+    verbose_name = 'Warehouse Inventory Management'
+
+    def ready(self):
+        from . import signals  # noqa: F401
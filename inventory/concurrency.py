@@ -0,0 +1,89 @@
+"""
+Run a report's independent queries at the same time.
+
+DRF views are synchronous, so instead of async views the reports hand
+their independent querysets to a bounded, process-wide thread pool
+(REPORT_QUERY_WORKERS threads), and a report's latency becomes that of
+its slowest query rather than the sum.
+
+Each pool thread keeps its database connection open between tasks, so a
+process holds at most REPORT_QUERY_WORKERS extra connections and does not
+pay a connection setup per query. Pool threads never see the request
+signals that apply CONN_MAX_AGE; a connection is only dropped when a
+failed query left it unusable or a task left a transaction open.
+
+Inside an atomic block the queries run in order on the caller's
+connection, because other connections cannot see its uncommitted writes.
+They also run in order on SQLite, which executes queries in-process and
+gains nothing from the extra threads and connections.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'REPORT_QUERY_WORKERS', 4),
+                thread_name_prefix='report-query'
+            )
+        return _executor
+
+
+def run_concurrently(tasks):
+    """Call a dict of zero-argument callables, concurrently where possible; results by key"""
+    active = connections.all(initialized_only=True)
+    if (
+        len(tasks) < 2
+        or getattr(settings, 'REPORT_QUERY_WORKERS', 4) < 2
+        or connections[DEFAULT_DB_ALIAS].vendor == 'sqlite'
+        or any(connection.in_atomic_block for connection in active)
+    ):
+        return {name: task() for name, task in tasks.items()}
+
+    # Query metrics and profiling hook the caller's connections; the pool threads inherit their wrappers
+    wrappers = {connection.alias: list(connection.execute_wrappers) for connection in active}
+    futures = {
+        name: get_executor().submit(_run, task, wrappers)
+        for name, task in tasks.items()
+    }
+    return {name: future.result() for name, future in futures.items()}
+
+
+def _run(task, wrappers):
+    try:
+        with ExitStack() as stack:
+            for alias, alias_wrappers in wrappers.items():
+                for wrapper in alias_wrappers:
+                    stack.enter_context(connections[alias].execute_wrapper(wrapper))
+            return task()
+    finally:
+        _release_connections()
+
+
+def _release_connections():
+    """Keep this pool thread's connections for its next task unless they can no longer be trusted
+
+    Mirrors close_if_unusable_or_obsolete without the CONN_MAX_AGE expiry.
+    """
+    for connection in connections.all(initialized_only=True):
+        if connection.connection is None:
+            continue
+        # Lets CONN_HEALTH_CHECKS test the connection again before the next task's first query
+        connection.health_check_done = False
+        if connection.get_autocommit() != connection.settings_dict['AUTOCOMMIT']:
+            connection.close()
+        elif connection.errors_occurred:
+            if connection.is_usable():
+                connection.errors_occurred = False
+            else:
+                connection.close()
@@ -0,0 +1,55 @@
+"""
+Conditional GET (ETag / Last-Modified) for API views backed by the ledger version.
+
+Every product or stock write bumps LedgerVersion, so the version is a cheap
+validator for any read: a matching If-None-Match is answered with 304 before
+the view runs a single query of its own.
+"""
+import hashlib
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .models import LedgerVersion
+
+
+def ledger_etag(request, version):
+    """Strong ETag for this request's representation at a ledger version"""
+    # Several reports default to date windows relative to today, so the date is part of the tag
+    variant = '|'.join([
+        request.get_full_path(),
+        request.META.get('HTTP_ACCEPT', ''),
+        timezone.localdate().isoformat(),
+    ])
+    digest = hashlib.md5(variant.encode('utf-8')).hexdigest()
+    return f'"{version}-{digest}"'
+
+
+def ledger_last_modified(updated_at):
+    """Last ledger write, or the start of today if that is later"""
+    start_of_day = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+    return max(updated_at, start_of_day) if updated_at else start_of_day
+
+
+class LedgerConditionalMixin:
+    """Answer GET/HEAD with ETag and Last-Modified from the ledger version, and 304 when unchanged"""
+    # Actions whose output does not follow the ledger version
+    conditional_exempt_actions = ()
+
+    def dispatch(self, request, *args, **kwargs):
+        action = getattr(self, 'action_map', {}).get(request.method.lower())
+        if request.method not in ('GET', 'HEAD') or action in self.conditional_exempt_actions:
+            return super().dispatch(request, *args, **kwargs)
+
+        version, updated_at = LedgerVersion.objects.state()
+        view = condition(
+            etag_func=lambda request, *args, **kwargs: ledger_etag(request, version),
+            last_modified_func=lambda request, *args, **kwargs: ledger_last_modified(updated_at),
+        )(super().dispatch)
+
+        response = view(request, *args, **kwargs)
+        # Clients may keep the response but must revalidate it before every reuse
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
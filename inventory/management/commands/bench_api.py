@@ -0,0 +1,220 @@
+import json
+import math
+import platform
+import statistics
+import time
+import tracemalloc
+from contextlib import ExitStack
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from inventory.metrics import QueryRecorder
+from inventory.models import ProductMaster, StockMain, StockDetail
+from inventory.report_cache import get_report_cache
+from inventory.urls import router
+
+
+def action_params():
+    """Query parameters needed for actions that reject a bare GET"""
+    today = timezone.localdate()
+    return {
+        # seed_benchmark spreads its transactions over the past year by default
+        'stock_movement_report': {
+            'start_date': (today - timedelta(days=365)).isoformat(),
+            'end_date': today.isoformat(),
+        },
+        'pick_suggestion': {'qty': '10'},
+    }
+
+
+def api_endpoints():
+    """(name, url, params) for the list, detail and GET actions of every registered viewset"""
+    params = action_params()
+    endpoints = []
+    for prefix, viewset, basename in router.registry:
+        sample = None
+        if hasattr(viewset, 'retrieve'):
+            queryset = viewset.queryset.order_by('pk')
+            if queryset.model is ProductMaster:
+                # The product with the longest history exercises the per-product actions the hardest
+                queryset = ProductMaster.objects.annotate(lines=Count('stock_details')).order_by('-lines', 'pk')
+            sample = queryset.values_list('pk', flat=True).first()
+
+        if hasattr(viewset, 'list'):
+            endpoints.append((f'{prefix} list', reverse(f'{basename}-list'), {}))
+        if sample is not None:
+            endpoints.append((f'{prefix} detail', reverse(f'{basename}-detail', args=[sample]), {}))
+
+        for extra in viewset.get_extra_actions():
+            if 'get' not in extra.mapping or (extra.detail and sample is None):
+                continue
+            args = [sample] if extra.detail else []
+            endpoints.append((
+                f'{prefix} {extra.url_name}',
+                reverse(f'{basename}-{extra.url_name}', args=args),
+                params.get(extra.__name__, {})
+            ))
+    return endpoints
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark every GET endpoint and action on the API router: latency percentiles, queries and memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Timed requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed requests per endpoint first')
+        parser.add_argument(
+            '--warm-cache', action='store_true',
+            help='Keep the report cache between requests (by default it is cleared so every request does the work)'
+        )
+        parser.add_argument('--only', help='Only endpoints whose name contains this text')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--compare', help='Compare against a JSON file written by an earlier --output run')
+        parser.add_argument(
+            '--threshold', type=float, default=20.0,
+            help='Percent p95 increase reported as a regression by --compare'
+        )
+        parser.add_argument(
+            '--fail-on-regression', action='store_true',
+            help='Exit with an error if --compare finds a regression'
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+        self.client = Client(SERVER_NAME='localhost')
+        self.options = options
+
+        endpoints = [
+            endpoint for endpoint in api_endpoints()
+            if not options['only'] or options['only'] in endpoint[0]
+        ]
+        if not endpoints:
+            raise CommandError('No endpoints to benchmark')
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{len(endpoints)} endpoints, {options["repeat"]} requests each '
+            f'({"warm" if options["warm_cache"] else "cold"} report cache)'
+        ))
+        self.stdout.write(
+            f'{"endpoint":<42} {"status":>6} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"queries":>8} {"peak KB":>9}'
+        )
+
+        results = {}
+        for name, url, params in endpoints:
+            result = results[name] = self.measure(url, params)
+            line = (
+                f'{name:<42} {result["status"]:>6} {result["p50_ms"]:>9.2f} {result["p95_ms"]:>9.2f} '
+                f'{result["p99_ms"]:>9.2f} {result["queries"]:>8} {result["peak_memory_kb"]:>9.0f}'
+            )
+            self.stdout.write(line if result['status'] < 400 else self.style.ERROR(line))
+
+        report = {
+            'generated_at': timezone.now().isoformat(),
+            'environment': {
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'products': ProductMaster.objects.count(),
+                'transactions': StockMain.objects.count(),
+                'stock_details': StockDetail.objects.count(),
+            },
+            'options': {
+                'repeat': options['repeat'],
+                'warmup': options['warmup'],
+                'warm_cache': options['warm_cache'],
+            },
+            'endpoints': results,
+        }
+
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Wrote {options["output"]}'))
+
+        if options['compare']:
+            self.compare(report, options['compare'])
+
+    def request(self, url, params):
+        if not self.options['warm_cache']:
+            get_report_cache().clear()
+        return self.client.get(url, params)
+
+    def measure(self, url, params):
+        for _ in range(self.options['warmup']):
+            self.request(url, params)
+
+        timings, query_counts = [], []
+        for _ in range(self.options['repeat']):
+            recorder = QueryRecorder()
+            with ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(recorder))
+                started = time.perf_counter()
+                response = self.request(url, params)
+                timings.append((time.perf_counter() - started) * 1000)
+            query_counts.append(recorder.count)
+
+        # Memory is traced in a separate request so tracing overhead stays out of the timings
+        tracemalloc.start()
+        try:
+            self.request(url, params)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'url': url,
+            'params': params,
+            'status': response.status_code,
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'mean_ms': round(statistics.mean(timings), 3),
+            'queries': max(query_counts),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    def compare(self, report, path):
+        try:
+            with open(path) as handle:
+                baseline = json.load(handle)['endpoints']
+        except (OSError, ValueError, KeyError) as exc:
+            raise CommandError(f'Cannot read baseline {path}: {exc}')
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\nCompared with {path}'))
+        self.stdout.write(f'{"endpoint":<42} {"p95 ms":>19} {"change":>8} {"queries":>11}')
+        regressions = []
+        for name, result in report['endpoints'].items():
+            before = baseline.get(name)
+            if before is None:
+                self.stdout.write(f'{name:<42} {"(new)":>19}')
+                continue
+            change = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0.0
+            line = (
+                f'{name:<42} {before["p95_ms"]:>8.2f} -> {result["p95_ms"]:>8.2f} {change:>+7.1f}% '
+                f'{before["queries"]:>4} -> {result["queries"]:<4}'
+            )
+            if change > self.options['threshold'] or result['queries'] > before['queries']:
+                regressions.append(name)
+                line = self.style.ERROR(line)
+            self.stdout.write(line)
+
+        if regressions:
+            message = f'{len(regressions)} endpoint(s) regressed: {", ".join(regressions)}'
+            if self.options['fail_on_regression']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS('No regressions'))
@@ -0,0 +1,134 @@
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.test import Client
+from django.utils import timezone
+
+from inventory.models import ProductMaster, StockMain, StockDetail, signed_quantity
+
+
+class LockTimer:
+    """execute_wrapper that adds up time spent in SELECT ... FOR UPDATE"""
+
+    def __init__(self):
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        if 'FOR UPDATE' not in sql:
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = (
+        'Fire parallel OUT transactions at one hot product and check the final balance. '
+        'Creates its own benchmark product and deletes it, with its transactions, when done; '
+        'do not run against production data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent clients')
+        parser.add_argument('--requests', type=int, default=200, help='Total OUT requests')
+        parser.add_argument('--quantity', type=Decimal, default=Decimal('1'), help='Quantity per pick')
+        parser.add_argument('--initial-stock', type=Decimal, default=Decimal('100'), help='Opening stock')
+
+    def handle(self, *args, **options):
+        if not connection.features.has_select_for_update:
+            raise CommandError(
+                f'{connection.vendor} has no row locks and allows one writer at a time, so concurrent '
+                'picks fail with "database is locked"; run this against PostgreSQL'
+            )
+
+        product = ProductMaster.objects.create(
+            product_code=f"BENCH{int(time.time() * 1000) % 10 ** 12}",
+            product_name='Concurrency benchmark product'
+        )
+        try:
+            status_code = self.post(Client(SERVER_NAME='localhost'), product, 'IN', options['initial_stock'])
+            if status_code != 201:
+                raise CommandError(f'Opening stock receipt failed with HTTP {status_code}')
+            self.run(product, options)
+        finally:
+            self.clean_up(product)
+
+    def run(self, product, options):
+        outcomes = []
+        outcomes_lock = threading.Lock()
+
+        def pick(_):
+            client = Client(SERVER_NAME='localhost', raise_request_exception=False)
+            timer = LockTimer()
+            started = time.perf_counter()
+            try:
+                with connection.execute_wrapper(timer):
+                    status_code = self.post(client, product, 'OUT', options['quantity'])
+            finally:
+                connection.close()
+            with outcomes_lock:
+                outcomes.append((status_code, time.perf_counter() - started, timer.seconds))
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+            list(executor.map(pick, range(options['requests'])))
+        elapsed = time.perf_counter() - started
+
+        self.report(product, options, outcomes, elapsed)
+
+    def clean_up(self, product):
+        """Delete the benchmark product and its transactions; the delete signals unwind balances and rollups"""
+        with transaction.atomic():
+            StockMain.objects.filter(stock_details__product=product).delete()
+            product.delete()
+
+    def post(self, client, product, transaction_type, quantity):
+        response = client.post('/api/transactions/', json.dumps({
+            'transaction_type': transaction_type,
+            'transaction_date': timezone.now().isoformat(),
+            'stock_details': [{'product': product.pk, 'quantity': str(quantity)}],
+        }), content_type='application/json')
+        return response.status_code
+
+    def report(self, product, options, outcomes, elapsed):
+        latencies = sorted(latency * 1000 for _, latency, _ in outcomes)
+        lock_waits = [wait * 1000 for _, _, wait in outcomes]
+        succeeded = sum(1 for status_code, _, _ in outcomes if status_code == 201)
+        rejected = sum(1 for status_code, _, _ in outcomes if status_code == 400)
+        failed = len(outcomes) - succeeded - rejected
+
+        balance = ProductMaster.objects.get(pk=product.pk).current_stock
+        ledger = StockDetail.objects.filter(product=product).aggregate(
+            total=Sum(signed_quantity())
+        )['total'] or 0
+        expected = options['initial_stock'] - succeeded * options['quantity']
+
+        self.stdout.write(f"Database: {connection.vendor}, threads: {options['threads']}")
+        self.stdout.write(
+            f"Requests: {len(outcomes)} in {elapsed:.2f}s "
+            f"({len(outcomes) / elapsed:.1f} req/s, {succeeded / elapsed:.1f} picks/s)"
+        )
+        self.stdout.write(f"Succeeded: {succeeded}, insufficient stock: {rejected}, errors: {failed}")
+        self.stdout.write(
+            f"Latency ms: p50 {statistics.median(latencies):.1f}, "
+            f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.1f}, max {latencies[-1]:.1f}"
+        )
+        self.stdout.write(
+            f"Lock wait ms: total {sum(lock_waits):.1f}, "
+            f"mean {statistics.mean(lock_waits):.2f}, max {max(lock_waits):.1f}"
+        )
+        self.stdout.write(f"Final balance: {balance}, ledger: {ledger}, expected: {expected}")
+        if not (balance == ledger == expected and balance >= 0):
+            raise CommandError('Consistency violation detected')
+        if failed:
+            raise CommandError(f'{failed} request(s) failed; the balance check does not cover them')
+        self.stdout.write(self.style.SUCCESS('Balance is consistent, no oversell'))
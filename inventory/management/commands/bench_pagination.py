@@ -0,0 +1,58 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from inventory.models import StockMain, StockDetail
+from inventory.pagination import TransactionPagination, StockDetailPagination
+
+
+class Command(BaseCommand):
+    help = 'Compare first-page and deep-page latency for page number and cursor pagination'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page', type=int, default=10000, help='Deep page number to compare against page 1')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed requests per case')
+
+    def handle(self, *args, **options):
+        self.client = Client(SERVER_NAME='localhost')
+        endpoints = [
+            ('/api/transactions/', StockMain, TransactionPagination),
+            ('/api/stock-details/', StockDetail, StockDetailPagination),
+        ]
+
+        for url, model, pagination_class in endpoints:
+            paginator = pagination_class()
+            page_size = paginator.page_size
+            total = model.objects.count()
+            deep_page = max(1, min(options['page'], total // page_size))
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'\n{url} ({total} rows, page size {page_size}, deep page {deep_page})'
+            ))
+
+            self.report('page=1', url, {'page': 1}, options['repeat'])
+            self.report(f'page={deep_page}', url, {'page': deep_page}, options['repeat'])
+            self.report('cursor, first page', url, {'pagination': 'cursor'}, options['repeat'])
+
+            # Cursor positioned at the same depth, built outside the timed requests
+            field = pagination_class.keyset_field
+            anchor = model.objects.order_by(f'-{field}', '-id')[(deep_page - 1) * page_size:][:1].first()
+            if anchor is not None:
+                cursor = paginator.cursor_token(anchor)
+                self.report(f'cursor, page ~{deep_page}', url, {'cursor': cursor}, options['repeat'])
+
+    def report(self, label, url, params, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            response = self.client.get(url, params)
+            timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                self.stdout.write(self.style.ERROR(f'{label}: HTTP {response.status_code}'))
+                return
+
+        self.stdout.write(
+            f'{label:<24} median {statistics.median(timings):8.2f} ms   '
+            f'min {min(timings):8.2f} ms   max {max(timings):8.2f} ms'
+        )
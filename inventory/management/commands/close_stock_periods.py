@@ -0,0 +1,72 @@
+import calendar
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inventory.models import StockMain, StockPeriod, ledger_date
+
+PERIOD_TYPES = {'daily': 'DAY', 'monthly': 'MON'}
+
+
+def month_end(date):
+    return date.replace(day=calendar.monthrange(date.year, date.month)[1])
+
+
+class Command(BaseCommand):
+    help = 'Close stock periods, snapshotting balances per product, location and lot at each period end'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--period', choices=sorted(PERIOD_TYPES),
+            default=getattr(settings, 'STOCK_PERIOD', 'monthly'),
+            help='Period boundaries to close'
+        )
+        parser.add_argument(
+            '--through',
+            help='Close periods ending on or before this date (YYYY-MM-DD); '
+                 'defaults to the last complete period'
+        )
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Drop all existing snapshots and close every period from the first transaction'
+        )
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        if options['through']:
+            try:
+                through = datetime.strptime(options['through'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Invalid date format. Use YYYY-MM-DD')
+        elif options['period'] == 'daily':
+            through = today - timedelta(days=1)
+        else:
+            through = today.replace(day=1) - timedelta(days=1)
+
+        if options['rebuild']:
+            StockPeriod.objects.all().delete()
+
+        last = StockPeriod.objects.order_by('-period_end').first()
+        if last:
+            start = last.period_end + timedelta(days=1)
+        else:
+            first = StockMain.objects.order_by('transaction_date').values_list('transaction_date', flat=True).first()
+            if first is None:
+                self.stdout.write(self.style.WARNING('No transactions to snapshot'))
+                return
+            start = ledger_date(first)
+
+        closed = 0
+        period_end = start if options['period'] == 'daily' else month_end(start)
+        while period_end <= through:
+            period = StockPeriod.objects.close(period_end, PERIOD_TYPES[options['period']])
+            self.stdout.write(f'Closed {period} ({period.snapshots.count()} snapshot rows)')
+            closed += 1
+            period_end = (
+                period_end + timedelta(days=1) if options['period'] == 'daily'
+                else month_end(period_end + timedelta(days=1))
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'Closed {closed} period(s) through {through}'))
@@ -0,0 +1,103 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from inventory.models import ProductMaster, StockDetail, DailyTransactionRollup
+from inventory.views import (
+    ProductMasterViewSet, StockMainViewSet, StockDetailViewSet, dashboard_queries, inventory_values,
+    low_stock, movement_report_ledger, movement_values, product_movements, with_inventory_totals
+)
+
+
+class Command(BaseCommand):
+    help = 'Print EXPLAIN plans and timings for the hot API queries (run against seeded data)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Number of timed runs per query'
+        )
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help='Use EXPLAIN ANALYZE (PostgreSQL only)'
+        )
+        parser.add_argument(
+            '--days', type=int, default=30,
+            help='Date range used by the report queries'
+        )
+        parser.add_argument(
+            '--only',
+            help='Only run queries whose label contains this text'
+        )
+
+    def get_queries(self, product, start_date, end_date):
+        """(label, queryset, how to run it) for each query the API issues per request
+
+        Querysets come from the viewsets and the helpers their actions use, so the
+        plans shown are those of the queries the API actually runs.
+        """
+        page_size = 20
+        products = ProductMasterViewSet.queryset
+        transactions = StockMainViewSet.queryset.order_by(*StockMainViewSet.ordering)
+        queries = [
+            ('products.list', products.order_by(*ProductMasterViewSet.ordering)[:page_size], list),
+            ('products.list?ordering=-current_stock', products.order_by('-current_stock')[:page_size], list),
+            ('products.low_stock_alert', low_stock(products), list),
+            ('products.stock_movements', product_movements(StockDetail.objects.filter(product=product)), list),
+            ('transactions.list', transactions[:page_size], list),
+            ('transactions.list?status=PENDING', transactions.filter(status='PENDING')[:page_size], list),
+            ('transactions.transaction_summary', DailyTransactionRollup.objects.filter(
+                date__range=[start_date, end_date]
+            ), lambda queryset: DailyTransactionRollup.objects.summary(start_date, end_date)),
+            ('stock-details.list', StockDetailViewSet.queryset.order_by(*StockDetailViewSet.ordering)[:page_size], list),
+            ('reports.current_inventory', with_inventory_totals(inventory_values()), list),
+            ('reports.stock_movement_report', movement_values(
+                movement_report_ledger(start_date, end_date)
+            )[:page_size], list),
+        ]
+        queries.extend(
+            (f'reports.dashboard_stats.{name}', queryset, compute)
+            for name, (queryset, compute) in dashboard_queries().items()
+        )
+        return queries
+
+    def handle(self, *args, **options):
+        product = ProductMaster.objects.order_by('pk').first()
+        if product is None:
+            self.stdout.write(self.style.WARNING('No products found; seed the database first'))
+            return
+
+        explain_options = {}
+        if options['analyze']:
+            if connection.vendor == 'postgresql':
+                explain_options = {'analyze': True, 'buffers': True}
+            else:
+                self.stdout.write(self.style.WARNING(
+                    f'EXPLAIN ANALYZE is not supported on {connection.vendor}; showing plans only'
+                ))
+
+        end_date = timezone.now().date()
+        start_date = end_date - timedelta(days=options['days'])
+        self.stdout.write(f'Database: {connection.vendor} ({connection.settings_dict["NAME"]})')
+
+        for label, queryset, run in self.get_queries(product, start_date, end_date):
+            if options['only'] and options['only'] not in label:
+                continue
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\n{label}'))
+            self.stdout.write(queryset.explain(**explain_options))
+
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                run(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+
+            self.stdout.write(self.style.SUCCESS(
+                f'min {min(timings):.2f} ms, median {statistics.median(timings):.2f} ms, '
+                f'max {max(timings):.2f} ms over {len(timings)} runs'
+            ))
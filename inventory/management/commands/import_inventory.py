@@ -0,0 +1,215 @@
+import csv
+import json
+import os
+import time
+from datetime import datetime
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from inventory.models import ProductMaster, StockMain, StockDetail, post_ledger_lines
+from inventory.report_cache import bump_ledger_version
+from inventory.serializers import ProductImportSerializer
+
+PRODUCT_FIELDS = [
+    'product_code', 'product_name', 'description', 'category', 'unit_of_measure',
+    'minimum_stock_level', 'maximum_stock_level', 'standard_cost', 'is_active'
+]
+
+
+class Command(BaseCommand):
+    help = 'Bulk import products and opening stock from a CSV file in resumable batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='CSV file with a header row; columns are the product fields plus optional '
+                 'opening_quantity, unit_cost, location, lot_batch_number and expiry_date'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows validated and committed together')
+        parser.add_argument(
+            '--transaction-date',
+            help='Date of the opening stock transactions (YYYY-MM-DD); defaults to now'
+        )
+        parser.add_argument('--checkpoint', help='Checkpoint file; defaults to <path>.checkpoint')
+        parser.add_argument('--rejects', help='CSV file for rejected rows; defaults to <path>.rejects.csv')
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Skip the rows already committed according to the checkpoint file'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'File not found: {path}')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        self.transaction_date = timezone.now()
+        if options['transaction_date']:
+            try:
+                self.transaction_date = timezone.make_aware(
+                    datetime.strptime(options['transaction_date'], '%Y-%m-%d')
+                )
+            except ValueError:
+                raise CommandError('Invalid date format. Use YYYY-MM-DD')
+
+        checkpoint_path = options['checkpoint'] or f'{path}.checkpoint'
+        rejects_path = options['rejects'] or f'{path}.rejects.csv'
+
+        # Row numbers only mean something for the file they were counted in
+        stat = os.stat(path)
+        source = {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        self.progress = {**source, 'row': 0, 'imported': 0, 'rejected': 0, 'batches': 0}
+        if options['resume'] and os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as f:
+                checkpoint = json.load(f)
+            changed = [key for key, value in source.items() if checkpoint.get(key) != value]
+            if changed:
+                raise CommandError(
+                    f"{checkpoint_path} was written for a different or modified file ({', '.join(changed)} differ); "
+                    'run without --resume to start over'
+                )
+            self.progress.update(checkpoint)
+            self.stdout.write(f"Resuming after row {self.progress['row']}")
+
+        started = time.perf_counter()
+        processed = 0
+        with open(path, newline='', encoding='utf-8-sig') as source, \
+                open(rejects_path, 'a' if options['resume'] else 'w', newline='') as rejects_file:
+            reader = csv.DictReader(source)
+            if not reader.fieldnames or 'product_code' not in reader.fieldnames:
+                raise CommandError('CSV header must include product_code')
+
+            self.rejects = csv.DictWriter(
+                rejects_file, fieldnames=['row', *reader.fieldnames, 'errors'], extrasaction='ignore'
+            )
+            if rejects_file.tell() == 0:
+                self.rejects.writeheader()
+
+            batch = []
+            for row_number, row in enumerate(reader, start=1):
+                if row_number <= self.progress['row']:
+                    continue
+                batch.append((row_number, row))
+                if len(batch) >= options['batch_size']:
+                    processed += self.import_batch(batch, checkpoint_path)
+                    self.report(processed, started)
+                    batch = []
+            if batch:
+                processed += self.import_batch(batch, checkpoint_path)
+                self.report(processed, started)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {self.progress['imported']} products, rejected {self.progress['rejected']} rows "
+            f"({processed / elapsed if elapsed else 0:.0f} rows/s this run)"
+        ))
+        if self.progress['rejected']:
+            self.stdout.write(self.style.WARNING(f'Rejected rows written to {rejects_path}'))
+
+    def import_batch(self, batch, checkpoint_path):
+        """Validate and commit one batch, then move the checkpoint past it"""
+        # One serializer for the whole batch, so its fields are only built once
+        serializer = ProductImportSerializer()
+        valid, rejected = {}, []
+        for row_number, row in batch:
+            # Empty cells fall back to the serializer defaults
+            data = {key: value.strip() for key, value in row.items() if key and value and value.strip()}
+            try:
+                validated_data = serializer.run_validation(data)
+            except serializers.ValidationError as exc:
+                rejected.append((row_number, row, exc.detail))
+                continue
+            if validated_data['product_code'] in valid:
+                rejected.append((row_number, row, {'product_code': ['Duplicate product code in file.']}))
+            else:
+                valid[validated_data['product_code']] = (row_number, row, validated_data)
+
+        # One query for the whole batch instead of one uniqueness check per row
+        existing = set(
+            ProductMaster.objects.filter(product_code__in=list(valid)).values_list('product_code', flat=True)
+        )
+        for code in existing:
+            row_number, row, _ = valid.pop(code)
+            rejected.append((row_number, row, {'product_code': ['Product code already exists.']}))
+
+        with transaction.atomic():
+            products = ProductMaster.objects.bulk_create([
+                ProductMaster(**{field: data[field] for field in PRODUCT_FIELDS if field in data})
+                for _, _, data in valid.values()
+            ])
+            if products and products[0].pk is None:
+                ids = dict(ProductMaster.objects.filter(
+                    product_code__in=list(valid)
+                ).values_list('product_code', 'id'))
+                for product in products:
+                    product.pk = ids[product.product_code]
+
+            self.post_opening_stock(products, valid)
+            if products:
+                bump_ledger_version()
+
+        for row_number, row, errors in sorted(rejected, key=lambda item: item[0]):
+            self.rejects.writerow({**row, 'row': row_number, 'errors': json.dumps(errors)})
+
+        self.progress['row'] = batch[-1][0]
+        self.progress['imported'] += len(products)
+        self.progress['rejected'] += len(rejected)
+        self.progress['batches'] += 1
+        self.save_checkpoint(checkpoint_path)
+
+        return len(batch)
+
+    def post_opening_stock(self, products, valid):
+        """Post the batch's opening quantities as a single stock-in transaction"""
+        details = []
+        for product in products:
+            data = valid[product.product_code][2]
+            if not data['opening_quantity']:
+                continue
+            unit_cost = data.get('unit_cost')
+            if unit_cost is None:
+                unit_cost = product.standard_cost
+            details.append(StockDetail(
+                product=product,
+                quantity=data['opening_quantity'],
+                unit_cost=unit_cost,
+                total_cost=data['opening_quantity'] * unit_cost,
+                location=data.get('location') or None,
+                lot_batch_number=data.get('lot_batch_number') or None,
+                expiry_date=data.get('expiry_date'),
+            ))
+        if not details:
+            return
+
+        stock_main = StockMain(
+            transaction_date=self.transaction_date,
+            transaction_type='IN',
+            status='COMPLETED',
+            remarks='Opening stock import',
+            created_by='import',
+            total_amount=sum((detail.total_cost for detail in details), Decimal('0')),
+        )
+        stock_main.save()
+        for detail in details:
+            detail.stock_main = stock_main
+        StockDetail.objects.bulk_create(details)
+        post_ledger_lines(details)
+
+    def save_checkpoint(self, checkpoint_path):
+        # Write then rename, so an interrupted run never leaves a truncated checkpoint
+        temporary_path = f'{checkpoint_path}.tmp'
+        with open(temporary_path, 'w') as f:
+            json.dump(self.progress, f)
+        os.replace(temporary_path, checkpoint_path)
+
+    def report(self, processed, started):
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Row {self.progress['row']}: {self.progress['imported']} imported, "
+            f"{self.progress['rejected']} rejected ({processed / elapsed if elapsed else 0:.0f} rows/s)"
+        )
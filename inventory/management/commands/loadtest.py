@@ -0,0 +1,303 @@
+import http.client
+import importlib.util
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from urllib.parse import urlencode, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from inventory.management.commands.bench_api import percentile
+
+CODE_PREFIX = 'LOADTEST'
+DEFAULT_MIX = 'dashboard=40,search=30,receipt=15,pick=15'
+SEARCH_TERMS = ['LOADTEST', 'load', 'test', '00', 'zzz-no-match']
+
+
+class HttpClient:
+    """One keep-alive http.client connection per worker thread, reopened when the server closes it"""
+
+    def __init__(self, base_url, timeout):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.timeout = timeout
+        self.connection = None
+
+    def request(self, method, path, payload=None):
+        """Return (status, decoded JSON or None); raises on network errors"""
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        body = json.dumps(payload) if payload is not None else None
+        headers = {'Accept': 'application/json'}
+        if body is not None:
+            headers['Content-Type'] = 'application/json'
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.close()
+            raise
+        if response.will_close:
+            self.close()
+        try:
+            return response.status, json.loads(data) if data else None
+        except ValueError:
+            return response.status, None
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay a mix of dashboard polls, product searches, receipts and picks against a running '
+        'server (or a gunicorn started here) and check the resulting stock for consistency. '
+        f'Writes {CODE_PREFIX}* products and transactions; do not run against production data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of the server under test')
+        parser.add_argument(
+            '--start-server', action='store_true',
+            help='Start gunicorn with --workers sync workers on the --url port for the duration of the run'
+        )
+        parser.add_argument('--workers', type=int, default=4, help='gunicorn workers for --start-server')
+        parser.add_argument('--clients', type=int, default=16, help='Concurrent client threads')
+        parser.add_argument('--duration', type=float, default=30.0, help='Seconds to generate load for')
+        parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Weighted operation mix (default {DEFAULT_MIX})')
+        parser.add_argument('--products', type=int, default=10, help='Hot products that receipts and picks hit')
+        parser.add_argument('--initial-stock', type=Decimal, default=Decimal('100'), help='Opening stock per product')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout in seconds')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed for the operation sequence')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.mix = self.parse_mix(options['mix'])
+        server = self.start_server() if options['start_server'] else None
+        try:
+            client = HttpClient(options['url'], options['timeout'])
+            self.wait_for_server(client)
+            self.products = self.set_up_products(client)
+            opening = self.balances(client)
+
+            outcomes, elapsed = self.run_load()
+            closing = self.balances(client)
+            client.close()
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+
+        self.report(outcomes, elapsed)
+        self.check_consistency(outcomes, opening, closing)
+
+    def parse_mix(self, mix):
+        weights = {}
+        for part in mix.split(','):
+            name, _, weight = part.partition('=')
+            name = name.strip()
+            if not hasattr(self, f'op_{name}'):
+                raise CommandError(f'Unknown operation "{name}" in --mix')
+            try:
+                weights[name] = float(weight)
+            except ValueError:
+                raise CommandError(f'Invalid weight for "{name}" in --mix')
+        if not weights or sum(weights.values()) <= 0:
+            raise CommandError('--mix needs at least one positive weight')
+        return weights
+
+    def start_server(self):
+        if importlib.util.find_spec('gunicorn') is None:
+            raise CommandError('gunicorn is not installed; start a server yourself and pass --url')
+        parts = urlsplit(self.options['url'])
+        command = [
+            sys.executable, '-m', 'gunicorn', 'warehouse_system.wsgi:application',
+            '--workers', str(self.options['workers']),
+            '--bind', f'{parts.hostname}:{parts.port or 80}',
+        ]
+        self.stdout.write(f'Starting {" ".join(command[2:])}')
+        return subprocess.Popen(command, env=os.environ.copy())
+
+    def wait_for_server(self, client, attempts=50):
+        for _ in range(attempts):
+            try:
+                client.request('GET', '/api/')
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f'No server answering at {self.options["url"]}')
+
+    def set_up_products(self, client):
+        """Create or refresh the hot products and give each its opening stock; returns {id: code}"""
+        codes = [f'{CODE_PREFIX}{number:04d}' for number in range(1, self.options['products'] + 1)]
+        status, data = client.request('POST', '/api/products/bulk_upsert/', [
+            {'product_code': code, 'product_name': f'Load test product {code[-4:]}', 'standard_cost': '1.00'}
+            for code in codes
+        ])
+        if status != 200:
+            raise CommandError(f'Could not create load test products: HTTP {status} {data}')
+
+        products = {}
+        path = '/api/products/?' + urlencode({'search': CODE_PREFIX})
+        while path:
+            status, data = client.request('GET', path)
+            if status != 200:
+                raise CommandError(f'Could not list load test products: HTTP {status}')
+            for product in data['results']:
+                if product['product_code'] in codes:
+                    products[product['id']] = product['product_code']
+            path = data['next'] and urlsplit(data['next'])._replace(scheme='', netloc='').geturl()
+
+        status, data = client.request('POST', '/api/transactions/', self.transaction_payload('IN', [
+            (product_id, self.options['initial_stock']) for product_id in products
+        ]))
+        if status != 201:
+            raise CommandError(f'Could not post opening stock: HTTP {status} {data}')
+        return products
+
+    def balances(self, client):
+        balances = {}
+        for product_id in self.products:
+            status, data = client.request('GET', f'/api/products/{product_id}/')
+            if status != 200:
+                raise CommandError(f'Could not read product {product_id}: HTTP {status}')
+            balances[product_id] = Decimal(str(data['current_stock']))
+        return balances
+
+    def transaction_payload(self, transaction_type, lines):
+        return {
+            'transaction_type': transaction_type,
+            'transaction_date': timezone.now().isoformat(),
+            'status': 'COMPLETED',
+            'created_by': 'loadtest',
+            'stock_details': [
+                {'product': product_id, 'quantity': str(quantity), 'unit_cost': '1.00'}
+                for product_id, quantity in lines
+            ],
+        }
+
+    def run_load(self):
+        deadline = time.monotonic() + self.options['duration']
+        outcomes = []
+        outcomes_lock = threading.Lock()
+
+        def worker(index):
+            rng = random.Random(self.options['seed'] * 1000 + index)
+            client = HttpClient(self.options['url'], self.options['timeout'])
+            names, weights = list(self.mix), list(self.mix.values())
+            local = []
+            while time.monotonic() < deadline:
+                name = rng.choices(names, weights)[0]
+                method, path, payload, lines = getattr(self, f'op_{name}')(rng)
+                started = time.perf_counter()
+                try:
+                    status, _ = client.request(method, path, payload)
+                except (OSError, http.client.HTTPException) as exc:
+                    status = type(exc).__name__
+                local.append((name, status, (time.perf_counter() - started) * 1000, lines))
+            client.close()
+            with outcomes_lock:
+                outcomes.extend(local)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{self.options["clients"]} clients for {self.options["duration"]:.0f}s against {self.options["url"]}'
+        ))
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.options['clients']) as executor:
+            list(executor.map(worker, range(self.options['clients'])))
+        return outcomes, time.perf_counter() - started
+
+    # Each operation returns (method, path, payload, signed stock changes it makes if it succeeds)
+
+    def op_dashboard(self, rng):
+        return 'GET', '/api/reports/dashboard_stats/', None, []
+
+    def op_search(self, rng):
+        return 'GET', '/api/products/?' + urlencode({'search': rng.choice(SEARCH_TERMS)}), None, []
+
+    def op_receipt(self, rng):
+        lines = [
+            (product_id, Decimal(rng.randint(1, 20)))
+            for product_id in rng.sample(list(self.products), min(len(self.products), rng.randint(1, 3)))
+        ]
+        return 'POST', '/api/transactions/', self.transaction_payload('IN', lines), lines
+
+    def op_pick(self, rng):
+        lines = [(rng.choice(list(self.products)), Decimal(rng.randint(1, 10)))]
+        return (
+            'POST', '/api/transactions/', self.transaction_payload('OUT', lines),
+            [(product_id, -quantity) for product_id, quantity in lines]
+        )
+
+    def report(self, outcomes, elapsed):
+        total = len(outcomes)
+        if not total:
+            raise CommandError('No requests completed')
+        self.stdout.write(f'Requests: {total} in {elapsed:.1f}s ({total / elapsed:.1f} req/s)')
+        self.stdout.write(
+            f'{"operation":<12} {"count":>7} {"ok":>7} {"4xx":>6} {"errors":>7} '
+            f'{"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"max ms":>9}'
+        )
+        errors = 0
+        for name in self.mix:
+            rows = [outcome for outcome in outcomes if outcome[0] == name]
+            if not rows:
+                continue
+            latencies = [latency for _, _, latency, _ in rows]
+            ok = sum(1 for _, status, _, _ in rows if isinstance(status, int) and status < 400)
+            rejected = sum(1 for _, status, _, _ in rows if isinstance(status, int) and 400 <= status < 500)
+            failed = len(rows) - ok - rejected
+            errors += failed
+            self.stdout.write(
+                f'{name:<12} {len(rows):>7} {ok:>7} {rejected:>6} {failed:>7} '
+                f'{percentile(latencies, 50):>9.1f} {percentile(latencies, 95):>9.1f} '
+                f'{percentile(latencies, 99):>9.1f} {max(latencies):>9.1f}'
+            )
+        style = self.style.ERROR if errors else self.style.SUCCESS
+        self.stdout.write(style(f'Error rate: {errors / total:.2%} (5xx and network errors; 4xx are rejections)'))
+        if errors and connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING(
+                'SQLite allows one writer at a time; concurrent writes fail with "database is locked"'
+            ))
+
+    def check_consistency(self, outcomes, opening, closing):
+        """Closing stock must equal opening stock plus the accepted movements, and never be negative"""
+        expected = dict(opening)
+        indeterminate = set()
+        for _, status, _, lines in outcomes:
+            for product_id, delta in lines:
+                if status == 201:
+                    expected[product_id] += delta
+                elif not isinstance(status, int) or status >= 500:
+                    # The server may or may not have committed it
+                    indeterminate.add(product_id)
+
+        violations = []
+        for product_id, code in sorted(self.products.items()):
+            if closing[product_id] < 0:
+                violations.append(f'{code}: oversold, stock is {closing[product_id]}')
+            elif product_id not in indeterminate and closing[product_id] != expected[product_id]:
+                violations.append(f'{code}: stock {closing[product_id]}, expected {expected[product_id]}')
+
+        if indeterminate:
+            self.stdout.write(self.style.WARNING(
+                f'{len(indeterminate)} product(s) had failed writes and were only checked for oversell'
+            ))
+        if violations:
+            for violation in violations:
+                self.stdout.write(self.style.ERROR(violation))
+            raise CommandError(f'{len(violations)} consistency violation(s)')
+        self.stdout.write(self.style.SUCCESS(
+            f'Stock consistent for {len(self.products)} products, no oversell'
+        ))
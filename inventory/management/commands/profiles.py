@@ -0,0 +1,92 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.metrics import normalize_sql
+from inventory.profiling import load_profile, profile_dir, render_profile, stored_profiles
+
+
+class Command(BaseCommand):
+    help = 'List, show and diff request profiles recorded with ?_profile=1'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', nargs='?', default='list', choices=['list', 'show', 'diff'])
+        parser.add_argument('ids', nargs='*', help='Profile id for show; base and new profile ids for diff')
+        parser.add_argument('--view', help='list: only profiles of views whose name contains this text')
+        parser.add_argument(
+            '--sort', default='cumulative',
+            help='show: pstats sort key (cumulative, tottime, ncalls, ...)'
+        )
+        parser.add_argument('--limit', type=int, default=30, help='Functions shown by show and diff')
+
+    def handle(self, *args, **options):
+        expected = {'list': 0, 'show': 1, 'diff': 2}[options['action']]
+        if len(options['ids']) != expected:
+            raise CommandError(f"{options['action']} takes {expected} profile id(s)")
+        getattr(self, options['action'])(*options['ids'], options=options)
+
+    def load(self, profile_id):
+        try:
+            return load_profile(profile_id)
+        except FileNotFoundError:
+            raise CommandError(f'No profile {profile_id} in {profile_dir()}')
+
+    def list(self, options):
+        profiles = [
+            metadata for metadata in stored_profiles()
+            if not options['view'] or options['view'] in metadata['view']
+        ]
+        if not profiles:
+            self.stdout.write(f'No profiles in {profile_dir()}')
+            return
+        self.stdout.write(f'{"id":<23} {"status":>6} {"ms":>9} {"queries":>8}  request')
+        for metadata in profiles:
+            self.stdout.write(
+                f"{metadata['id']:<23} {metadata['status']:>6} {metadata['duration_ms']:>9.1f} "
+                f"{len(metadata['queries']):>8}  {metadata['method']} {metadata['path']}"
+            )
+
+    def show(self, profile_id, options):
+        metadata, stats = self.load(profile_id)
+        self.stdout.write(render_profile(metadata, stats, sort=options['sort'], limit=options['limit']))
+
+    def diff(self, base_id, new_id, options):
+        (base, base_stats), (new, new_stats) = self.load(base_id), self.load(new_id)
+        base_sql = sum(query['duration_ms'] for query in base['queries'])
+        new_sql = sum(query['duration_ms'] for query in new['queries'])
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{base_id} -> {new_id}'))
+        self.stdout.write(f"Requests: {base['path']} -> {new['path']}")
+        self.stdout.write(f"Wall time: {base['duration_ms']:.1f} -> {new['duration_ms']:.1f} ms")
+        self.stdout.write(f"Queries: {len(base['queries'])} -> {len(new['queries'])}, SQL {base_sql:.1f} -> {new_sql:.1f} ms")
+
+        # Cumulative time per function, largest changes first
+        base_times, new_times = self.cumulative_ms(base_stats), self.cumulative_ms(new_stats)
+        changes = sorted(
+            base_times.keys() | new_times.keys(),
+            key=lambda function: abs(new_times.get(function, 0) - base_times.get(function, 0)),
+            reverse=True
+        )
+        self.stdout.write(self.style.MIGRATE_HEADING('\nLargest cumulative time changes (ms)'))
+        for function in changes[:options['limit']]:
+            before, after = base_times.get(function, 0.0), new_times.get(function, 0.0)
+            self.stdout.write(f'{before:>10.2f} {after:>10.2f} {after - before:>+10.2f}  {self.label(function)}')
+
+        base_statements = Counter(normalize_sql(query['sql']) for query in base['queries'])
+        new_statements = Counter(normalize_sql(query['sql']) for query in new['queries'])
+        changed = [
+            (sql, base_statements[sql], new_statements[sql])
+            for sql in base_statements.keys() | new_statements.keys()
+            if base_statements[sql] != new_statements[sql]
+        ]
+        if changed:
+            self.stdout.write(self.style.MIGRATE_HEADING('\nStatements run a different number of times'))
+            for sql, before, after in sorted(changed, key=lambda row: row[1] - row[2]):
+                self.stdout.write(f'{before:>5} -> {after:<5} {sql[:300]}')
+
+    def cumulative_ms(self, stats):
+        return {function: values[3] * 1000 for function, values in stats.stats.items()}
+
+    def label(self, function):
+        filename, line, name = function
+        return f'{name} ({filename}:{line})' if line else name
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from inventory.models import StockBalance, LocationBalance, LotBalance
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized stock, location and lot balance tables from the stock ledger'
+
+    def handle(self, *args, **options):
+        count = StockBalance.objects.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt stock balances for {count} products')
+        )
+        count = LocationBalance.objects.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt {count} location balance rows')
+        )
+        count = LotBalance.objects.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt {count} lot balance rows')
+        )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from inventory.models import DailyTransactionRollup
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily transaction rollup table from the transaction headers'
+
+    def handle(self, *args, **options):
+        count = DailyTransactionRollup.objects.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt {count} daily transaction rollup rows')
+        )
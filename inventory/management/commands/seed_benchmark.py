@@ -0,0 +1,189 @@
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from inventory.models import (
+    ProductMaster, StockMain, StockDetail, StockBalance, LocationBalance, LotBalance,
+    DailyTransactionRollup, StockPeriod, ledger_date
+)
+from inventory.report_cache import bump_ledger_version
+from inventory.signals import deletes_rebuilt_afterwards
+from inventory.transaction_ids import allocate_transaction_ids
+
+CODE_PREFIX = 'BENCH'
+CODE_PATTERN = rf'^{CODE_PREFIX}[0-9]{{7}}$'
+CATEGORIES = [code for code, _ in ProductMaster.PRODUCT_CATEGORIES]
+UNITS = [code for code, _ in ProductMaster.UNIT_CHOICES]
+STATUSES = ['COMPLETED'] * 8 + ['PENDING', 'DRAFT']
+
+
+class Command(BaseCommand):
+    help = 'Generate deterministic synthetic products and stock transactions for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000, help='Products to create')
+        parser.add_argument('--transactions', type=int, default=10000, help='Transaction headers to create')
+        parser.add_argument('--lines', type=int, default=5, help='Maximum lines per transaction')
+        parser.add_argument('--locations', type=int, default=20, help='Distinct storage locations')
+        parser.add_argument('--days', type=int, default=365, help='Spread transactions over this many days')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed gives the same data')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Transaction headers written per batch')
+        parser.add_argument(
+            '--clear', action='store_true',
+            help=f'Delete previously seeded {CODE_PREFIX}* products and their transactions first'
+        )
+
+    def handle(self, *args, **options):
+        if options['products'] < options['lines']:
+            raise CommandError('--products must be at least --lines')
+        if options['locations'] < 2:
+            raise CommandError('--locations must be at least 2 so transfers have a destination')
+        if self.seeded_products().exists():
+            if not options['clear']:
+                raise CommandError(f'{CODE_PREFIX}* products already exist; pass --clear to replace them')
+            self.clear()
+
+        self.random = random.Random(options['seed'])
+        started = time.perf_counter()
+
+        products = self.create_products(options)
+        self.stdout.write(f'Created {len(products)} products')
+
+        lines = self.create_transactions(products, options)
+        self.stdout.write(f"Created {options['transactions']} transactions with {lines} lines")
+
+        self.rebuild_derived_tables()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded in {time.perf_counter() - started:.1f}s (seed {options["seed"]})'
+        ))
+
+    def seeded_products(self):
+        return ProductMaster.objects.filter(product_code__regex=CODE_PATTERN)
+
+    def seeded_headers(self):
+        return StockMain.objects.filter(
+            created_by='seed_benchmark', stock_details__product__in=self.seeded_products()
+        )
+
+    def rebuild_derived_tables(self):
+        """Rebuild balances and rollups, and drop the closed periods from the first seeded date on"""
+        first = self.seeded_headers().aggregate(first=Min('transaction_date'))['first']
+        # Rebuilding once is far cheaper than maintaining the derived tables row by row
+        StockBalance.objects.rebuild()
+        LocationBalance.objects.rebuild()
+        LotBalance.objects.rebuild()
+        DailyTransactionRollup.objects.rebuild()
+        if first:
+            StockPeriod.objects.invalidate_from(ledger_date(first))
+        bump_ledger_version()
+
+    def clear(self):
+        headers = StockMain.objects.filter(pk__in=self.seeded_headers().values('pk'))
+        first = headers.aggregate(first=Min('transaction_date'))['first']
+        with transaction.atomic(), deletes_rebuilt_afterwards():
+            headers.delete()
+            self.seeded_products().delete()
+            if first:
+                StockPeriod.objects.invalidate_from(ledger_date(first))
+        self.stdout.write('Removed previously seeded data')
+
+    def create_products(self, options):
+        products = []
+        for number in range(1, options['products'] + 1):
+            minimum = Decimal(self.random.randint(0, 50))
+            products.append(ProductMaster(
+                product_code=f'{CODE_PREFIX}{number:07d}',
+                product_name=f'Benchmark product {number}',
+                category=self.random.choice(CATEGORIES),
+                unit_of_measure=self.random.choice(UNITS),
+                minimum_stock_level=minimum,
+                maximum_stock_level=minimum + self.random.randint(50, 500),
+                standard_cost=Decimal(self.random.randint(50, 50000)) / 100,
+            ))
+        ProductMaster.objects.bulk_create(products, batch_size=1000)
+        return list(self.seeded_products().order_by('product_code'))
+
+    def create_transactions(self, products, options):
+        """Write headers and lines in batches, never letting a product's simulated stock go negative"""
+        locations = [f'BIN-{number:03d}' for number in range(1, options['locations'] + 1)]
+        end = timezone.make_aware(datetime.combine(timezone.localdate(), datetime.min.time())) - timedelta(days=1)
+        start = end - timedelta(days=options['days'])
+        step = (end - start) / max(options['transactions'], 1)
+
+        # Simulated stock per product and (lot, location), so OUT and TRF lines are always covered
+        on_hand = {}
+        written = 0
+        for batch_start in range(0, options['transactions'], options['batch_size']):
+            count = min(options['batch_size'], options['transactions'] - batch_start)
+            headers, details = [], []
+            for offset, transaction_id in enumerate(allocate_transaction_ids(count)):
+                header = StockMain(
+                    transaction_id=transaction_id,
+                    transaction_date=start + step * (batch_start + offset),
+                    transaction_type=self.random.choices(['IN', 'OUT', 'ADJ', 'TRF'], weights=[45, 40, 10, 5])[0],
+                    status=self.random.choice(STATUSES),
+                    created_by='seed_benchmark',
+                )
+                lines = self.build_lines(header, products, locations, on_hand, options)
+                if not lines:
+                    header.transaction_type = 'IN'
+                    lines = self.build_lines(header, products, locations, on_hand, options)
+                header.total_amount = sum((line.total_cost for line in lines), Decimal('0'))
+                headers.append(header)
+                details.append(lines)
+
+            with transaction.atomic():
+                StockMain.objects.bulk_create(headers)
+                if headers[0].pk is None:
+                    ids = dict(StockMain.objects.filter(
+                        transaction_id__in=[header.transaction_id for header in headers]
+                    ).values_list('transaction_id', 'id'))
+                    for header in headers:
+                        header.pk = ids[header.transaction_id]
+                for header, lines in zip(headers, details):
+                    for line in lines:
+                        line.stock_main = header
+                StockDetail.objects.bulk_create(
+                    [line for lines in details for line in lines], batch_size=5000
+                )
+
+            written += sum(len(lines) for lines in details)
+            self.stdout.write(f'  {batch_start + count} transactions, {written} lines')
+        return written
+
+    def build_lines(self, header, products, locations, on_hand, options):
+        lines = []
+        for product in self.random.sample(products, self.random.randint(1, options['lines'])):
+            stock = on_hand.setdefault(product.pk, {})
+            if header.transaction_type in ('IN', 'ADJ'):
+                lot = f'{product.product_code}-L{self.random.randint(1, 5)}'
+                location = self.random.choice(locations)
+                quantity = Decimal(self.random.randint(1, 200))
+                stock[(lot, location)] = stock.get((lot, location), 0) + quantity
+                expiry_date = header.transaction_date.date() + timedelta(days=self.random.randint(30, 720))
+                destination = None
+            else:
+                stocked = sorted(key for key, quantity in stock.items() if quantity >= 1)
+                if not stocked:
+                    continue
+                lot, location = self.random.choice(stocked)
+                quantity = Decimal(self.random.randint(1, int(stock[(lot, location)])))
+                stock[(lot, location)] -= quantity
+                expiry_date = destination = None
+                if header.transaction_type == 'TRF':
+                    destination = self.random.choice([other for other in locations if other != location])
+                    stock[(lot, destination)] = stock.get((lot, destination), 0) + quantity
+
+            lines.append(StockDetail(
+                product=product, quantity=quantity, unit_cost=product.standard_cost,
+                total_cost=quantity * product.standard_cost, lot_batch_number=lot, location=location,
+                destination_location=destination, expiry_date=expiry_date,
+            ))
+        return lines
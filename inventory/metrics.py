@@ -0,0 +1,170 @@
+"""
+Per-request latency and SQL query instrumentation.
+
+QueryMetricsMiddleware times every request and, through
+connection.execute_wrapper, counts its SQL queries and SQL time, so it
+works with DEBUG off. Results are kept per view as in-process histograms
+and served at /metrics in the Prometheus text format. Requests that are
+slow or issue many queries are logged with their most repeated statements.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+
+logger = logging.getLogger('inventory.slow_requests')
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# Collapses IN lists and VALUES rows so statements differing only in arity group together
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+
+
+def normalize_sql(sql):
+    return _PLACEHOLDER_LIST.sub('(...)', ' '.join(sql.split()))
+
+
+class QueryRecorder:
+    """execute_wrapper that counts queries, adds up their time and tallies repeated statements
+
+    Report query threads share the request's recorder, so updates hold a lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            statement = normalize_sql(sql)
+            with self._lock:
+                self.seconds += elapsed
+                self.count += 1
+                self.statements[statement] += 1
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.total += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+
+class MetricsRegistry:
+    """Histograms per (view, method), accumulated for the life of the worker process"""
+
+    METRICS = (
+        ('http_request_duration_seconds', 'Request wall time', DURATION_BUCKETS),
+        ('http_request_db_queries', 'SQL queries per request', QUERY_COUNT_BUCKETS),
+        ('http_request_db_seconds', 'SQL time per request', DURATION_BUCKETS),
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, view, method, duration, queries, sql_seconds):
+        with self._lock:
+            series = self._series.get((view, method))
+            if series is None:
+                series = self._series[(view, method)] = [Histogram(buckets) for _, _, buckets in self.METRICS]
+            for histogram, value in zip(series, (duration, queries, sql_seconds)):
+                histogram.observe(value)
+
+    def render(self):
+        """All series in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for index, (name, help_text, _) in enumerate(self.METRICS):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for (view, method), series in sorted(self._series.items()):
+                    histogram = series[index]
+                    labels = f'view="{_escape(view)}",method="{method}"'
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+                    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.total}')
+                    lines.append(f'{name}_sum{{{labels}}} {histogram.sum:.6f}')
+                    lines.append(f'{name}_count{{{labels}}} {histogram.total}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+class QueryMetricsMiddleware:
+    """Record wall time, query count and SQL time for every request, by resolved view"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'METRICS_ENABLED', True)
+        self.slow_request_ms = getattr(settings, 'METRICS_SLOW_REQUEST_MS', 500)
+        self.slow_query_count = getattr(settings, 'METRICS_SLOW_QUERY_COUNT', 100)
+        self.skip_prefixes = ('/metrics', settings.STATIC_URL)
+
+    def __call__(self, request):
+        if not self.enabled or request.path.startswith(self.skip_prefixes):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        match = request.resolver_match
+        view = (match.view_name or match._func_path) if match else 'unresolved'
+        registry.observe(view, request.method, duration, recorder.count, recorder.seconds)
+
+        if duration * 1000 >= self.slow_request_ms or recorder.count >= self.slow_query_count:
+            self.log_slow_request(request, view, response, duration, recorder)
+
+        return response
+
+    def log_slow_request(self, request, view, response, duration, recorder):
+        repeated = [
+            f'  {count}x {sql[:300]}'
+            for sql, count in recorder.statements.most_common(5) if count > 1
+        ]
+        logger.warning(
+            'Slow request %s %s (%s) -> %s: %.0f ms, %d queries, %.0f ms SQL%s',
+            request.method, request.get_full_path(), view, response.status_code,
+            duration * 1000, recorder.count, recorder.seconds * 1000,
+            ('\nMost repeated statements:\n' + '\n'.join(repeated)) if repeated else ''
+        )
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint for this worker's request metrics"""
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
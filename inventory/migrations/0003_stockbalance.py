@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_stock_balances(apps, schema_editor):
+    StockDetail = apps.get_model('inventory', 'StockDetail')
+    StockBalance = apps.get_model('inventory', 'StockBalance')
+
+    # Adjustments carry signed quantities and add like receipts
+    directions = {'IN': 1, 'OUT': -1, 'ADJ': 1}
+    balances = {}
+    rows = StockDetail.objects.filter(
+        stock_main__transaction_type__in=list(directions)
+    ).values_list('product_id', 'stock_main__transaction_type').annotate(
+        total=models.Sum('quantity')
+    ).order_by()
+    for product_id, transaction_type, total in rows:
+        balances[product_id] = balances.get(product_id, 0) + directions[transaction_type] * total
+
+    StockBalance.objects.bulk_create(
+        [StockBalance(product_id=product_id, quantity=quantity) for product_id, quantity in balances.items()],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_auto_20250727_1538'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockBalance',
+            fields=[
+                ('product', models.OneToOneField(help_text='Product reference', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='balance', serialize=False, to='inventory.productmaster')),
+                ('quantity', models.DecimalField(decimal_places=2, default=0, help_text='Quantity on hand', max_digits=15)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Stock Balance',
+                'verbose_name_plural': 'Stock Balances',
+                'db_table': 'stckbal',
+                'ordering': ['product'],
+            },
+        ),
+        migrations.RunPython(populate_stock_balances, migrations.RunPython.noop),
+    ]
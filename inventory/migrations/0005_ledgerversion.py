@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:42
+
+from django.db import migrations, models
+
+
+def create_counter_row(apps, schema_editor):
+    LedgerVersion = apps.get_model('inventory', 'LedgerVersion')
+    LedgerVersion.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_stockbalance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0, help_text='Monotonically increasing ledger version')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Ledger Version',
+                'verbose_name_plural': 'Ledger Versions',
+                'db_table': 'ledgerver',
+            },
+        ),
+        migrations.RunPython(create_counter_row, migrations.RunPython.noop),
+    ]
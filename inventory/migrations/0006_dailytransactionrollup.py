@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:43
+
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+
+
+def populate_rollups(apps, schema_editor):
+    StockMain = apps.get_model('inventory', 'StockMain')
+    DailyTransactionRollup = apps.get_model('inventory', 'DailyTransactionRollup')
+
+    rows = StockMain.objects.annotate(
+        date=TruncDate('transaction_date')
+    ).values('date', 'transaction_type', 'status').annotate(
+        transaction_count=models.Count('id'),
+        total_amount=models.Sum('total_amount')
+    ).order_by()
+    DailyTransactionRollup.objects.bulk_create(
+        [DailyTransactionRollup(**row) for row in rows],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_ledgerversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyTransactionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text='Transaction date')),
+                ('transaction_type', models.CharField(choices=[('IN', 'Stock In'), ('OUT', 'Stock Out'), ('ADJ', 'Adjustment'), ('TRF', 'Transfer')], help_text='Type of transaction', max_length=3)),
+                ('status', models.CharField(choices=[('DRAFT', 'Draft'), ('PENDING', 'Pending'), ('COMPLETED', 'Completed'), ('CANCELLED', 'Cancelled')], help_text='Transaction status', max_length=10)),
+                ('transaction_count', models.IntegerField(default=0, help_text='Number of transactions')),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, help_text='Sum of transaction amounts', max_digits=17)),
+            ],
+            options={
+                'verbose_name': 'Daily Transaction Rollup',
+                'verbose_name_plural': 'Daily Transaction Rollups',
+                'db_table': 'txnrollup',
+                'ordering': ['-date', 'transaction_type', 'status'],
+                'unique_together': {('date', 'transaction_type', 'status')},
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
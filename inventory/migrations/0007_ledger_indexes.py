@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_dailytransactionrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockdetail',
+            index=models.Index(fields=['product', 'stock_main'], name='stckdetail_product_main_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockdetail',
+            index=models.Index(fields=['expiry_date'], name='stckdetail_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockdetail',
+            index=models.Index(fields=['created_at'], name='stckdetail_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmain',
+            index=models.Index(fields=['transaction_date', 'transaction_type'], name='stckmain_date_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmain',
+            index=models.Index(fields=['status'], name='stckmain_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmain',
+            index=models.Index(fields=['created_at'], name='stckmain_created_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:45
+
+from django.db import migrations, models
+
+SEQUENCE_NAME = 'stckmain_txn_seq'
+FIRST_VALUE = 10000
+
+
+def create_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE SEQUENCE IF NOT EXISTS {SEQUENCE_NAME} START WITH {FIRST_VALUE}'
+        )
+    else:
+        TransactionSequence = apps.get_model('inventory', 'TransactionSequence')
+        TransactionSequence.objects.get_or_create(
+            name=SEQUENCE_NAME,
+            defaults={'last_value': FIRST_VALUE - 1}
+        )
+
+
+def drop_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP SEQUENCE IF EXISTS {SEQUENCE_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_ledger_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionSequence',
+            fields=[
+                ('name', models.CharField(help_text='Sequence name', max_length=30, primary_key=True, serialize=False)),
+                ('last_value', models.BigIntegerField(default=0, help_text='Last value handed out')),
+            ],
+            options={
+                'verbose_name': 'Transaction Sequence',
+                'verbose_name_plural': 'Transaction Sequences',
+                'db_table': 'txnseq',
+            },
+        ),
+        migrations.RunPython(create_sequence, drop_sequence),
+    ]
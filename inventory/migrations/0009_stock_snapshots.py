@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_transaction_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockPeriod',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_end', models.DateField(help_text='Last day included in the period', unique=True)),
+                ('period_type', models.CharField(choices=[('DAY', 'Daily'), ('MON', 'Monthly')], help_text='Period granularity', max_length=3)),
+                ('closed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Stock Period',
+                'verbose_name_plural': 'Stock Periods',
+                'db_table': 'stckperiod',
+                'ordering': ['-period_end'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location', models.CharField(blank=True, default='', help_text='Storage location', max_length=50)),
+                ('lot_batch_number', models.CharField(blank=True, default='', help_text='Lot or batch number', max_length=50)),
+                ('quantity', models.DecimalField(decimal_places=2, default=0, help_text='Quantity at period end', max_digits=15)),
+                ('period', models.ForeignKey(help_text='Closed period', on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='inventory.stockperiod')),
+                ('product', models.ForeignKey(help_text='Product reference', on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='inventory.productmaster')),
+            ],
+            options={
+                'verbose_name': 'Stock Snapshot',
+                'verbose_name_plural': 'Stock Snapshots',
+                'db_table': 'stcksnap',
+                'ordering': ['period', 'product'],
+                'indexes': [models.Index(fields=['product', 'period'], name='stcksnap_product_period_idx')],
+                'unique_together': {('period', 'product', 'location', 'lot_batch_number')},
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_lot_balances(apps, schema_editor):
+    StockDetail = apps.get_model('inventory', 'StockDetail')
+    LotBalance = apps.get_model('inventory', 'LotBalance')
+
+    directions = {'IN': 1, 'OUT': -1, 'ADJ': 1}
+    balances = {}
+    rows = StockDetail.objects.filter(
+        stock_main__transaction_type__in=list(directions)
+    ).values_list('product_id', 'lot_batch_number', 'location', 'stock_main__transaction_type').annotate(
+        total=models.Sum('quantity'),
+        latest_expiry=models.Max('expiry_date')
+    ).order_by()
+    for product_id, lot, location, transaction_type, total, latest_expiry in rows:
+        key = (product_id, lot or '', location or '')
+        quantity, expiry_date = balances.get(key, (0, None))
+        balances[key] = (quantity + directions[transaction_type] * total, latest_expiry or expiry_date)
+
+    LotBalance.objects.bulk_create(
+        [
+            LotBalance(
+                product_id=product_id, lot_batch_number=lot, location=location,
+                expiry_date=expiry_date, quantity=quantity
+            )
+            for (product_id, lot, location), (quantity, expiry_date) in balances.items()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_stock_snapshots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LotBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lot_batch_number', models.CharField(blank=True, default='', help_text='Lot or batch number, blank for untracked stock', max_length=50)),
+                ('location', models.CharField(blank=True, default='', help_text='Storage location, blank when not recorded', max_length=50)),
+                ('expiry_date', models.DateField(blank=True, help_text='Lot expiry date', null=True)),
+                ('quantity', models.DecimalField(decimal_places=2, default=0, help_text='Quantity on hand', max_digits=15)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(help_text='Product reference', on_delete=django.db.models.deletion.CASCADE, related_name='lot_balances', to='inventory.productmaster')),
+            ],
+            options={
+                'verbose_name': 'Lot Balance',
+                'verbose_name_plural': 'Lot Balances',
+                'db_table': 'lotbal',
+                'ordering': ['product', 'expiry_date', 'lot_batch_number', 'location'],
+                'indexes': [models.Index(fields=['product', 'expiry_date'], name='lotbal_product_expiry_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='lotbalance',
+            constraint=models.UniqueConstraint(fields=('product', 'lot_batch_number', 'location'), name='lotbal_product_lot_location_uniq'),
+        ),
+        migrations.RunPython(populate_lot_balances, migrations.RunPython.noop),
+    ]
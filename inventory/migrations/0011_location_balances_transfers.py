@@ -0,0 +1,63 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_location_balances(apps, schema_editor):
+    LotBalance = apps.get_model('inventory', 'LotBalance')
+    LocationBalance = apps.get_model('inventory', 'LocationBalance')
+
+    # Transfers posted nothing before destination_location existed, so lots already hold every movement
+    rows = LotBalance.objects.values_list('product_id', 'location').annotate(
+        total=models.Sum('quantity')
+    ).order_by()
+    LocationBalance.objects.bulk_create(
+        [
+            LocationBalance(product_id=product_id, location=location, quantity=total)
+            for product_id, location, total in rows
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_lot_balances'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockdetail',
+            name='destination_location',
+            field=models.CharField(blank=True, help_text='Location a transfer moves stock to', max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='stockdetail',
+            name='location',
+            field=models.CharField(blank=True, help_text='Storage location (source location for transfers)', max_length=50, null=True),
+        ),
+        migrations.CreateModel(
+            name='LocationBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location', models.CharField(blank=True, default='', help_text='Storage location, blank when not recorded', max_length=50)),
+                ('quantity', models.DecimalField(decimal_places=2, default=0, help_text='Quantity on hand', max_digits=15)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(help_text='Product reference', on_delete=django.db.models.deletion.CASCADE, related_name='location_balances', to='inventory.productmaster')),
+            ],
+            options={
+                'verbose_name': 'Location Balance',
+                'verbose_name_plural': 'Location Balances',
+                'db_table': 'locbal',
+                'ordering': ['location', 'product'],
+                'indexes': [models.Index(fields=['location', 'product'], name='locbal_location_product_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='locationbalance',
+            constraint=models.UniqueConstraint(fields=('product', 'location'), name='locbal_product_location_uniq'),
+        ),
+        migrations.RunPython(populate_location_balances, migrations.RunPython.noop),
+    ]
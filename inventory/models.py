@@ -1,9 +1,52 @@
-from django.db import models
+from django.db import DatabaseError, models, transaction
+from django.db.models import F, Case, When, Value
+from django.db.models.functions import Coalesce
 from django.core.validators import MinValueValidator, MaxLengthValidator
 from django.core.exceptions import ValidationError
 from decimal import Decimal
+import logging
 import uuid
 
+logger = logging.getLogger(__name__)
+
+class ProductMasterQuerySet(models.QuerySet):
+    def with_stock(self, as_of=None):
+        """Annotate current_stock from the stock balance, or as of the end of a past date"""
+        output_field = models.DecimalField(max_digits=15, decimal_places=2)
+        
+        if as_of is None:
+            return self.annotate(
+                current_stock=Coalesce(F('balance__quantity'), Value(0), output_field=output_field)
+            )
+        
+        # Nearest closed period plus whatever was posted between its end and as_of
+        period = StockPeriod.objects.nearest(as_of)
+        ledger = StockDetail.objects.filter(
+            product=models.OuterRef('pk'),
+            stock_main__transaction_date__date__lte=as_of
+        )
+        snapshot = Value(0, output_field=output_field)
+        if period:
+            ledger = ledger.filter(stock_main__transaction_date__date__gt=period.period_end)
+            snapshot = models.Subquery(
+                StockSnapshot.objects.filter(
+                    period=period, product=models.OuterRef('pk')
+                ).values('product').annotate(total=models.Sum('quantity')).values('total'),
+                output_field=output_field
+            )
+        posted = models.Subquery(
+            ledger.values('product').annotate(total=models.Sum(signed_quantity())).values('total'),
+            output_field=output_field
+        )
+        
+        return self.annotate(
+            current_stock=models.ExpressionWrapper(
+                Coalesce(snapshot, Value(0), output_field=output_field)
+                + Coalesce(posted, Value(0), output_field=output_field),
+                output_field=output_field
+            )
+        )
+
 class ProductMaster(models.Model):
     """Product Master (prodmast) - stores product details"""
     
@@ -77,6 +120,8 @@ class ProductMaster(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ProductMasterQuerySet.as_manager()
+    
     class Meta:
         db_table = 'prodmast'
         verbose_name = 'Product Master'
@@ -96,24 +141,20 @@ class ProductMaster(models.Model):
     
     @property
     def current_stock(self):
-        """Calculate current stock from all transactions"""
-        from django.db.models import Sum, F
-        
-        stock_in = StockDetail.objects.filter(
-            product=self,
-            stock_main__transaction_type='IN'
-        ).aggregate(
-            total=Sum('quantity')
-        )['total'] or 0
-        
-        stock_out = StockDetail.objects.filter(
-            product=self,
-            stock_main__transaction_type='OUT'
-        ).aggregate(
-            total=Sum('quantity')
-        )['total'] or 0
-        
-        return stock_in - stock_out
+        """Current stock, read from the materialized stock balance"""
+        # Querysets built with with_stock() already carry the value
+        if '_current_stock' in self.__dict__:
+            return self._current_stock
+        
+        quantity = StockBalance.objects.filter(
+            product_id=self.pk
+        ).values_list('quantity', flat=True).first()
+        
+        return quantity or 0
+    
+    @current_stock.setter
+    def current_stock(self, value):
+        self._current_stock = value
 
 class StockMain(models.Model):
     """Stock Main (stckmain) - stores transaction header details"""
@@ -125,6 +166,13 @@ class StockMain(models.Model):
         ('TRF', 'Transfer'),
     ]
     
+    # Direction in which each transaction type moves the stock balance
+    STOCK_DIRECTION = {
+        'IN': 1,
+        'OUT': -1,
+        'ADJ': 1,
+    }
+    
     TRANSACTION_STATUS = [
         ('DRAFT', 'Draft'),
         ('PENDING', 'Pending'),
@@ -188,6 +236,11 @@ class StockMain(models.Model):
         verbose_name = 'Stock Transaction'
         verbose_name_plural = 'Stock Transactions'
         ordering = ['-transaction_date', '-created_at']
+        indexes = [
+            models.Index(fields=['transaction_date', 'transaction_type'], name='stckmain_date_type_idx'),
+            models.Index(fields=['status'], name='stckmain_status_idx'),
+            models.Index(fields=['created_at'], name='stckmain_created_idx'),
+        ]
     
     def clean(self):
         """Custom validation"""
@@ -201,19 +254,51 @@ class StockMain(models.Model):
     def save(self, *args, **kwargs):
         if not self.transaction_id:
             # Generate unique transaction ID
-            from django.utils import timezone
-            import random
+            from .transaction_ids import allocate_transaction_ids
+            
+            self.transaction_id, = allocate_transaction_ids(1)
+        
+        previous_type = getattr(self, '_loaded_transaction_type', None)
+        previous_rollup = getattr(self, '_loaded_rollup', None)
+        current_rollup = self.rollup_entry()
+        
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            
+            # Move the header between daily rollup buckets as its date, type, status or amount change
+            if current_rollup != previous_rollup:
+                entries = [(*current_rollup, 1)]
+                if previous_rollup:
+                    entries.append((*previous_rollup, -1))
+                DailyTransactionRollup.objects.apply_on_commit(entries)
             
-            date_prefix = timezone.now().strftime('%Y%m%d')
-            random_suffix = str(random.randint(1000, 9999))
-            self.transaction_id = f"TXN{date_prefix}{random_suffix}"
+            # Re-post existing lines when the transaction type changes
+            if previous_type and previous_type != self.transaction_type:
+                lines = []
+                for *values, quantity in self.stock_details.values_list(*StockDetail.LEDGER_FIELDS):
+                    lines.append((self.transaction_type, *values, quantity))
+                    lines.append((previous_type, *values, -quantity))
+                apply_ledger_lines(lines)
             
-            # Ensure uniqueness
-            while StockMain.objects.filter(transaction_id=self.transaction_id).exists():
-                random_suffix = str(random.randint(1000, 9999))
-                self.transaction_id = f"TXN{date_prefix}{random_suffix}"
+            # Re-dated or re-typed lines can land inside an already closed period. A new header
+            # posts nothing until its lines are saved, which invalidate after locking the balances.
+            if previous_rollup and previous_rollup[0][:2] != current_rollup[0][:2]:
+                StockPeriod.objects.invalidate_from(min(current_rollup[0][0], previous_rollup[0][0]))
         
-        super().save(*args, **kwargs)
+        self._loaded_transaction_type = self.transaction_type
+        self._loaded_rollup = current_rollup
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_transaction_type = instance.__dict__.get('transaction_type')
+        if not instance.get_deferred_fields():
+            instance._loaded_rollup = instance.rollup_entry()
+        return instance
+    
+    def rollup_entry(self):
+        """Daily rollup bucket (date, type, status) and the amount this header adds to it"""
+        return (ledger_date(self.transaction_date), self.transaction_type, self.status), self.total_amount
     
     def __str__(self):
         return f"{self.transaction_id} - {self.get_transaction_type_display()} ({self.transaction_date.strftime('%Y-%m-%d')})"
@@ -221,6 +306,11 @@ class StockMain(models.Model):
 class StockDetail(models.Model):
     """Stock Detail (stckdetail) - stores product details within each transaction"""
     
+    # Fields that decide what a line posts to the stock and lot balances
+    LEDGER_FIELDS = (
+        'product_id', 'lot_batch_number', 'location', 'destination_location', 'expiry_date', 'quantity'
+    )
+    
     stock_main = models.ForeignKey(
         StockMain, 
         on_delete=models.CASCADE, 
@@ -268,7 +358,13 @@ class StockDetail(models.Model):
         max_length=50, 
         blank=True, 
         null=True,
-        help_text="Storage location"
+        help_text="Storage location (source location for transfers)"
+    )
+    destination_location = models.CharField(
+        max_length=50,
+        blank=True,
+        null=True,
+        help_text="Location a transfer moves stock to"
     )
     remarks = models.TextField(
         blank=True, 
@@ -284,6 +380,11 @@ class StockDetail(models.Model):
         verbose_name_plural = 'Stock Details'
         ordering = ['stock_main', 'product']
         unique_together = [['stock_main', 'product', 'lot_batch_number']]
+        indexes = [
+            models.Index(fields=['product', 'stock_main'], name='stckdetail_product_main_idx'),
+            models.Index(fields=['expiry_date'], name='stckdetail_expiry_idx'),
+            models.Index(fields=['created_at'], name='stckdetail_created_idx'),
+        ]
     
     def clean(self):
         """Custom validation"""
@@ -306,15 +407,754 @@ class StockDetail(models.Model):
     def save(self, *args, **kwargs):
         # Calculate total cost
         self.total_cost = self.quantity * self.unit_cost
-        super().save(*args, **kwargs)
         
-        # Update stock main total
-        if self.stock_main:
-            total = self.stock_main.stock_details.aggregate(
-                total=models.Sum('total_cost')
-            )['total'] or 0
-            self.stock_main.total_amount = total
-            self.stock_main.save()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            
+            # Keep the materialized stock and lot balances in step with the ledger
+            apply_ledger_lines(self.ledger_lines())
+            StockPeriod.objects.invalidate_from(self.stock_main.rollup_entry()[0][0])
+            self._loaded_ledger = self.ledger_state()
+            
+            # Update stock main total
+            if self.stock_main:
+                total = self.stock_main.stock_details.aggregate(
+                    total=models.Sum('total_cost')
+                )['total'] or 0
+                self.stock_main.total_amount = total
+                self.stock_main.save()
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_ledger = instance.ledger_state()
+        return instance
+    
+    def ledger_state(self):
+        """Header id and the LEDGER_FIELDS values this line currently posts"""
+        values = self.__dict__
+        return values.get('stock_main_id'), tuple(values.get(field) for field in self.LEDGER_FIELDS)
+    
+    def ledger_line(self):
+        """This line as (transaction_type, *LEDGER_FIELDS values)"""
+        return (self.stock_main.transaction_type, *(getattr(self, field) for field in self.LEDGER_FIELDS))
+    
+    def ledger_lines(self):
+        """Ledger lines to apply when saving: this line, less what its persisted version posted"""
+        lines = [self.ledger_line()]
+        
+        # Reverse whatever the persisted version of the line contributed
+        loaded = getattr(self, '_loaded_ledger', None)
+        if loaded:
+            stock_main_id, (*values, quantity) = loaded
+            if stock_main_id == self.stock_main_id:
+                transaction_type = self.stock_main.transaction_type
+            else:
+                transaction_type = StockMain.objects.filter(
+                    pk=stock_main_id
+                ).values_list('transaction_type', flat=True).first()
+            lines.append((transaction_type, *values, -quantity))
+        
+        return lines
+    
+    def __str__(self):
+        return f"{self.stock_main.transaction_id} - {self.product.product_code} ({self.quantity})"
+
+class StockBalanceManager(models.Manager):
+    def apply_deltas(self, deltas, create_missing=True):
+        """Add signed quantity changes, keyed by product id, to the balance rows"""
+        from django.utils import timezone
+        
+        deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        
+        now = timezone.now()
+        with transaction.atomic():
+            # A single product is one conditional UPDATE, no read needed
+            if len(deltas) == 1:
+                (product_id, delta), = deltas.items()
+                updated = self.filter(product_id=product_id).update(
+                    quantity=F('quantity') + delta,
+                    updated_at=now
+                )
+                if updated or not create_missing:
+                    return
+            
+            if create_missing:
+                self.bulk_create(
+                    [self.model(product_id=product_id) for product_id in deltas],
+                    ignore_conflicts=True
+                )
+            
+            # Lock in product order so concurrent writers cannot deadlock
+            balances = list(
+                self.select_for_update().filter(product_id__in=deltas).order_by('product_id')
+            )
+            for balance in balances:
+                balance.quantity += deltas[balance.product_id]
+                balance.updated_at = now
+            self.bulk_update(balances, ['quantity', 'updated_at'], batch_size=500)
+    
+    def lock(self, product_ids):
+        """Lock balance rows in product order and return their quantities by product id"""
+        return dict(
+            self.select_for_update().filter(
+                product_id__in=product_ids
+            ).order_by('product_id').values_list('product_id', 'quantity')
+        )
+    
+    def rebuild(self):
+        """Recompute every balance row from the full ledger"""
+        totals = StockDetail.objects.values('product_id').annotate(
+            total=models.Sum(signed_quantity())
+        ).order_by()
+        
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(
+                [self.model(product_id=row['product_id'], quantity=row['total'] or 0) for row in totals],
+                batch_size=1000
+            )
+            # Reports cached against the old balances must not outlive the rebuild
+            transaction.on_commit(LedgerVersion.objects.bump)
+        
+        return self.count()
+
+class StockBalance(models.Model):
+    """Stock Balance (stckbal) - materialized current stock per product"""
+    
+    product = models.OneToOneField(
+        ProductMaster,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='balance',
+        help_text="Product reference"
+    )
+    quantity = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        default=0,
+        help_text="Quantity on hand"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = StockBalanceManager()
+    
+    class Meta:
+        db_table = 'stckbal'
+        verbose_name = 'Stock Balance'
+        verbose_name_plural = 'Stock Balances'
+        ordering = ['product']
+    
+    def __str__(self):
+        return f"{self.product_id} ({self.quantity})"
+
+class KeyedBalanceManager(models.Manager):
+    """Balance rows keyed on key_fields, starting with product_id, and moved by signed deltas"""
+    key_fields = ()
+    
+    def apply_deltas(self, deltas, create_missing=True, attributes=None):
+        """Add signed quantity changes, keyed by key_fields values, and set any per-key attributes"""
+        from django.utils import timezone
+        
+        attributes = attributes or {}
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        
+        now = timezone.now()
+        with transaction.atomic():
+            # A single row with nothing else to set is one conditional UPDATE, no read needed
+            if len(deltas) == 1:
+                (key, delta), = deltas.items()
+                if key not in attributes:
+                    updated = self.filter(**dict(zip(self.key_fields, key))).update(
+                        quantity=F('quantity') + delta,
+                        updated_at=now
+                    )
+                    if updated or not create_missing:
+                        return
+            
+            if create_missing:
+                self.bulk_create(
+                    [self.model(**dict(zip(self.key_fields, key))) for key in deltas],
+                    ignore_conflicts=True
+                )
+            
+            # Same product order as the stock balance rows, so lock order is consistent
+            balances = []
+            for balance in self.select_for_update().filter(
+                product_id__in={key[0] for key in deltas}
+            ).order_by(*self.key_fields):
+                key = tuple(getattr(balance, field) for field in self.key_fields)
+                if key not in deltas:
+                    continue
+                balance.quantity += deltas[key]
+                balance.updated_at = now
+                for field, value in attributes.get(key, {}).items():
+                    setattr(balance, field, value)
+                balances.append(balance)
+            
+            fields = {field for changes in attributes.values() for field in changes}
+            self.bulk_update(balances, ['quantity', 'updated_at', *sorted(fields)], batch_size=500)
+    
+    def lock(self, keys):
+        """Lock rows for the given keys in key order and return their quantities by key"""
+        keys = set(keys)
+        return {
+            key: quantity
+            for *key_values, quantity in self.select_for_update().filter(
+                product_id__in={key[0] for key in keys}
+            ).order_by(*self.key_fields).values_list(*self.key_fields, 'quantity')
+            if (key := tuple(key_values)) in keys
+        }
+    
+    def rebuild(self):
+        """Recompute every row from the full ledger"""
+        lines = StockDetail.objects.values_list(
+            'stock_main__transaction_type', 'product_id', 'lot_batch_number', 'location',
+            'destination_location'
+        ).annotate(
+            latest_expiry=models.Max('expiry_date'),
+            total=models.Sum('quantity')
+        ).order_by()
+        lot_deltas, expiries = ledger_lot_deltas(lines)
+        
+        rows = {}
+        for lot_key, delta in lot_deltas.items():
+            key = self.balance_key(lot_key)
+            rows[key] = rows.get(key, 0) + delta
+        expiries = self.rebuild_attributes(rows, expiries)
+        
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(
+                [
+                    self.model(
+                        quantity=quantity,
+                        **dict(zip(self.key_fields, key)),
+                        **expiries.get(key, {})
+                    )
+                    for key, quantity in rows.items() if quantity
+                ],
+                batch_size=1000
+            )
+            transaction.on_commit(LedgerVersion.objects.bump)
+        
+        return len(rows)
+    
+    def balance_key(self, lot_key):
+        """Key of the row a (product id, lot, location) change lands in"""
+        return lot_key
+    
+    def rebuild_attributes(self, rows, expiries):
+        """Per-key attributes for rebuilt rows"""
+        return expiries
+
+class LotBalanceManager(KeyedBalanceManager):
+    key_fields = ('product_id', 'lot_batch_number', 'location')
+    
+    def apply_deltas(self, deltas, create_missing=True, attributes=None):
+        """Apply lot changes; stock arriving without an expiry takes the lot's known expiry date"""
+        attributes = dict(attributes or {})
+        arriving = [key for key, delta in deltas.items() if delta > 0 and key[1] and key not in attributes]
+        if arriving:
+            known = {
+                (product_id, lot): expiry_date
+                for product_id, lot, expiry_date in self.filter(
+                    product_id__in={key[0] for key in arriving},
+                    lot_batch_number__in={key[1] for key in arriving},
+                    expiry_date__isnull=False
+                ).values_list('product_id', 'lot_batch_number', 'expiry_date')
+            }
+            for product_id, lot, location in arriving:
+                if (product_id, lot) in known:
+                    attributes[(product_id, lot, location)] = {'expiry_date': known[(product_id, lot)]}
+        
+        super().apply_deltas(deltas, create_missing=create_missing, attributes=attributes)
+    
+    def rebuild_attributes(self, rows, expiries):
+        """Rows reached only by transfers take the lot's expiry, as they do when posted incrementally"""
+        known = {}
+        for (product_id, lot, _), values in expiries.items():
+            if lot:
+                known.setdefault((product_id, lot), values)
+        return {
+            key: expiries.get(key) or known.get(key[:2], {})
+            for key in rows
+        }
+
+class LocationBalanceManager(KeyedBalanceManager):
+    key_fields = ('product_id', 'location')
+    
+    def balance_key(self, lot_key):
+        product_id, _, location = lot_key
+        return product_id, location
+
+class LotBalance(models.Model):
+    """Lot Balance (lotbal) - materialized stock per product, lot and location"""
+    
+    product = models.ForeignKey(
+        ProductMaster,
+        on_delete=models.CASCADE,
+        related_name='lot_balances',
+        help_text="Product reference"
+    )
+    lot_batch_number = models.CharField(
+        max_length=50,
+        blank=True,
+        default='',
+        help_text="Lot or batch number, blank for untracked stock"
+    )
+    location = models.CharField(
+        max_length=50,
+        blank=True,
+        default='',
+        help_text="Storage location, blank when not recorded"
+    )
+    expiry_date = models.DateField(
+        blank=True,
+        null=True,
+        help_text="Lot expiry date"
+    )
+    quantity = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        default=0,
+        help_text="Quantity on hand"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = LotBalanceManager()
+    
+    class Meta:
+        db_table = 'lotbal'
+        verbose_name = 'Lot Balance'
+        verbose_name_plural = 'Lot Balances'
+        ordering = ['product', 'expiry_date', 'lot_batch_number', 'location']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product', 'lot_batch_number', 'location'], name='lotbal_product_lot_location_uniq'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['product', 'expiry_date'], name='lotbal_product_expiry_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_id} {self.lot_batch_number or '-'} @ {self.location or '-'} ({self.quantity})"
+
+class LocationBalance(models.Model):
+    """Location Balance (locbal) - materialized stock per product and location"""
+    
+    product = models.ForeignKey(
+        ProductMaster,
+        on_delete=models.CASCADE,
+        related_name='location_balances',
+        help_text="Product reference"
+    )
+    location = models.CharField(
+        max_length=50,
+        blank=True,
+        default='',
+        help_text="Storage location, blank when not recorded"
+    )
+    quantity = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        default=0,
+        help_text="Quantity on hand"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = LocationBalanceManager()
+    
+    class Meta:
+        db_table = 'locbal'
+        verbose_name = 'Location Balance'
+        verbose_name_plural = 'Location Balances'
+        ordering = ['location', 'product']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'location'], name='locbal_product_location_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['location', 'product'], name='locbal_location_product_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_id} @ {self.location or '-'} ({self.quantity})"
+
+def post_ledger_lines(details):
+    """Apply the balance and closed period effects of newly inserted lines that bypassed StockDetail.save"""
+    if not details:
+        return
+    apply_ledger_lines([detail.ledger_line() for detail in details])
+    StockPeriod.objects.invalidate_from(min(ledger_date(detail.stock_main.transaction_date) for detail in details))
+
+def ledger_lot_deltas(lines):
+    """Lot balance changes and lot expiries for (transaction_type, product_id, lot, location,
+    destination_location, expiry_date, quantity) lines, keyed by (product id, lot, location)"""
+    lot_deltas, expiries = {}, {}
+    for transaction_type, product_id, lot, location, destination_location, expiry_date, quantity in lines:
+        if transaction_type == 'TRF':
+            # Transfers move stock between locations; one without a destination moves nothing
+            postings = [(location, -quantity), (destination_location, quantity)] if destination_location else []
+        else:
+            postings = [(location, stock_delta(transaction_type, quantity))]
+        
+        for posting_location, delta in postings:
+            key = (product_id, lot or '', posting_location or '')
+            lot_deltas[key] = lot_deltas.get(key, 0) + delta
+            if expiry_date:
+                expiries.setdefault(key, {'expiry_date': expiry_date})
+    
+    return lot_deltas, expiries
+
+def apply_ledger_lines(lines, create_missing=True):
+    """Apply ledger lines, as produced by StockDetail.ledger_line(), to the stock, location and lot balances"""
+    lot_deltas, expiries = ledger_lot_deltas(lines)
+    
+    deltas, location_deltas = {}, {}
+    for (product_id, _, location), delta in lot_deltas.items():
+        deltas[product_id] = deltas.get(product_id, 0) + delta
+        location_deltas[(product_id, location)] = location_deltas.get((product_id, location), 0) + delta
+    
+    # Rows are always locked product first, then location, then lot, and before any stock period;
+    # daily rollups are only updated after commit
+    StockBalance.objects.apply_deltas(deltas, create_missing=create_missing)
+    LocationBalance.objects.apply_deltas(location_deltas, create_missing=create_missing)
+    LotBalance.objects.apply_deltas(lot_deltas, create_missing=create_missing, attributes=expiries)
+
+def ledger_date(transaction_date):
+    """Calendar date of a transaction in the current time zone, as used by __date lookups"""
+    from django.utils import timezone
+    
+    if timezone.is_aware(transaction_date):
+        transaction_date = timezone.localtime(transaction_date)
+    return transaction_date.date()
+
+def stock_delta(transaction_type, quantity):
+    """Signed change a ledger line makes to its product's stock balance"""
+    return quantity * StockMain.STOCK_DIRECTION.get(transaction_type, 0)
+
+def signed_quantity(type_field='stock_main__transaction_type', quantity_field='quantity'):
+    """Database expression for a ledger line's quantity signed by direction"""
+    return Case(
+        *[
+            When(**{type_field: transaction_type}, then=F(quantity_field) * direction)
+            for transaction_type, direction in StockMain.STOCK_DIRECTION.items()
+        ],
+        default=Value(0),
+        output_field=models.DecimalField(max_digits=15, decimal_places=2)
+    )
+
+class LedgerVersionManager(models.Manager):
+    def current(self):
+        """Current ledger version, 0 if nothing has been written yet"""
+        return self.filter(pk=1).values_list('version', flat=True).first() or 0
+    
+    def state(self):
+        """Current (version, updated_at), with (0, None) if nothing has been written yet"""
+        return self.filter(pk=1).values_list('version', 'updated_at').first() or (0, None)
+    
+    def bump(self):
+        """Increment the ledger version, creating the counter row on first use"""
+        from django.utils import timezone
+        
+        updated = self.filter(pk=1).update(version=F('version') + 1, updated_at=timezone.now())
+        if not updated:
+            self.get_or_create(pk=1, defaults={'version': 1})
+
+class LedgerVersion(models.Model):
+    """Ledger Version (ledgerver) - counter bumped whenever stock data changes"""
+    
+    version = models.BigIntegerField(
+        default=0,
+        help_text="Monotonically increasing ledger version"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = LedgerVersionManager()
+    
+    class Meta:
+        db_table = 'ledgerver'
+        verbose_name = 'Ledger Version'
+        verbose_name_plural = 'Ledger Versions'
+    
+    def __str__(self):
+        return f"v{self.version}"
+
+class DailyTransactionRollupManager(models.Manager):
+    def apply_on_commit(self, entries):
+        """Apply entries once the current transaction commits
+        
+        Every posting of a day shares its (date, type, status) row, so updating it inside
+        the posting's transaction would hold the row locked and serialize same-day writes.
+        Applied after commit, the update is a short transaction of its own.
+        """
+        entries = list(entries)
+        transaction.on_commit(lambda: self.apply_committed(entries))
+    
+    def apply_committed(self, entries):
+        """Apply entries for a committed posting, recomputing their days if that fails"""
+        try:
+            with transaction.atomic():
+                self.apply_entries(entries)
+        except DatabaseError:
+            logger.exception('Daily rollup update failed; recomputing the affected days')
+            self.rebuild(dates={date for (date, _, _), _, _ in entries})
+        
+        # The posting's own bump ran first, so a summary cached in between holds the old rollups
+        LedgerVersion.objects.bump()
+    
+    def apply_entries(self, entries):
+        """Add (bucket, amount, count) entries to the daily rollup rows"""
+        changes = {}
+        for bucket, amount, count in entries:
+            total_count, total_amount = changes.get(bucket, (0, 0))
+            changes[bucket] = (total_count + count, total_amount + count * amount)
+        
+        for (date, transaction_type, status), (count, amount) in changes.items():
+            if not count and not amount:
+                continue
+            
+            rows = self.filter(date=date, transaction_type=transaction_type, status=status)
+            updates = {
+                'transaction_count': F('transaction_count') + count,
+                'total_amount': F('total_amount') + amount,
+            }
+            if not rows.update(**updates):
+                self.bulk_create(
+                    [self.model(date=date, transaction_type=transaction_type, status=status)],
+                    ignore_conflicts=True
+                )
+                rows.update(**updates)
+    
+    def summary(self, start_date, end_date):
+        """Transaction summary for a date range in one conditional aggregate query"""
+        from django.db.models import Q, Sum
+        
+        def count(**filters):
+            return Coalesce(Sum('transaction_count', filter=Q(**filters) if filters else None), 0)
+        
+        return self.filter(date__range=[start_date, end_date]).aggregate(
+            total_transactions=count(),
+            stock_in_transactions=count(transaction_type='IN'),
+            stock_out_transactions=count(transaction_type='OUT'),
+            adjustment_transactions=count(transaction_type='ADJ'),
+            total_value=Coalesce(Sum('total_amount'), Value(0), output_field=models.DecimalField(max_digits=17, decimal_places=2)),
+            pending_transactions=count(status='PENDING'),
+            completed_transactions=count(status='COMPLETED'),
+        )
+    
+    def rebuild(self, dates=None):
+        """Recompute the rollup rows, of every day or only of ``dates``, from the transaction headers"""
+        from django.db.models import Count, Sum
+        from django.db.models.functions import TruncDate
+        
+        headers = StockMain.objects.annotate(date=TruncDate('transaction_date'))
+        rollups = self.all()
+        if dates is not None:
+            headers = headers.filter(date__in=dates)
+            rollups = rollups.filter(date__in=dates)
+        rows = headers.values('date', 'transaction_type', 'status').annotate(
+            transaction_count=Count('id'),
+            total_amount=Sum('total_amount')
+        ).order_by()
+        
+        with transaction.atomic():
+            rollups.delete()
+            self.bulk_create([self.model(**row) for row in rows], batch_size=1000)
+            # Transaction summaries cached against the old rollups must not outlive the rebuild
+            transaction.on_commit(LedgerVersion.objects.bump)
+        
+        return rollups.count()
+
+class DailyTransactionRollup(models.Model):
+    """Daily Transaction Rollup (txnrollup) - transaction counts and amounts per day, type and status"""
+    
+    date = models.DateField(
+        help_text="Transaction date"
+    )
+    transaction_type = models.CharField(
+        max_length=3,
+        choices=StockMain.TRANSACTION_TYPES,
+        help_text="Type of transaction"
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=StockMain.TRANSACTION_STATUS,
+        help_text="Transaction status"
+    )
+    transaction_count = models.IntegerField(
+        default=0,
+        help_text="Number of transactions"
+    )
+    total_amount = models.DecimalField(
+        max_digits=17,
+        decimal_places=2,
+        default=0,
+        help_text="Sum of transaction amounts"
+    )
+    
+    objects = DailyTransactionRollupManager()
+    
+    class Meta:
+        db_table = 'txnrollup'
+        verbose_name = 'Daily Transaction Rollup'
+        verbose_name_plural = 'Daily Transaction Rollups'
+        ordering = ['-date', 'transaction_type', 'status']
+        unique_together = [['date', 'transaction_type', 'status']]
+    
+    def __str__(self):
+        return f"{self.date} {self.transaction_type}/{self.status} ({self.transaction_count})"
+
+class TransactionSequence(models.Model):
+    """Transaction Sequence (txnseq) - counter rows for databases without native sequences"""
+    
+    name = models.CharField(
+        max_length=30,
+        primary_key=True,
+        help_text="Sequence name"
+    )
+    last_value = models.BigIntegerField(
+        default=0,
+        help_text="Last value handed out"
+    )
+    
+    class Meta:
+        db_table = 'txnseq'
+        verbose_name = 'Transaction Sequence'
+        verbose_name_plural = 'Transaction Sequences'
+    
+    def __str__(self):
+        return f"{self.name} ({self.last_value})"
+
+class StockPeriodManager(models.Manager):
+    def nearest(self, as_of):
+        """Latest closed period ending on or before as_of"""
+        return self.filter(period_end__lte=as_of).order_by('-period_end').first()
+    
+    def invalidate_from(self, date):
+        """Drop closed periods, and their snapshots, that a posting dated ``date`` makes stale"""
+        self.filter(period_end__gte=date).delete()
+    
+    def close(self, period_end, period_type):
+        """Snapshot balances at period_end from the previous snapshot plus one period of ledger"""
+        from django.db.models import Sum
+        
+        previous = self.filter(period_end__lt=period_end).order_by('-period_end').first()
+        
+        balances = {}
+        if previous:
+            for product_id, location, lot, quantity in previous.snapshots.values_list(
+                'product_id', 'location', 'lot_batch_number', 'quantity'
+            ):
+                balances[(product_id, location, lot)] = quantity
+        
+        ledger = StockDetail.objects.filter(stock_main__transaction_date__date__lte=period_end)
+        if previous:
+            ledger = ledger.filter(stock_main__transaction_date__date__gt=previous.period_end)
+        lot_deltas, _ = ledger_lot_deltas(
+            ledger.values_list(
+                'stock_main__transaction_type', 'product_id', 'lot_batch_number', 'location',
+                'destination_location', 'expiry_date'
+            ).annotate(total=Sum('quantity')).order_by()
+        )
+        for (product_id, lot, location), delta in lot_deltas.items():
+            key = (product_id, location, lot)
+            balances[key] = balances.get(key, 0) + delta
+        
+        with transaction.atomic():
+            self.filter(period_end=period_end).delete()
+            period = self.create(period_end=period_end, period_type=period_type)
+            StockSnapshot.objects.bulk_create(
+                [
+                    StockSnapshot(
+                        period=period, product_id=product_id, location=location,
+                        lot_batch_number=lot, quantity=quantity
+                    )
+                    for (product_id, location, lot), quantity in balances.items() if quantity
+                ],
+                batch_size=1000
+            )
+        
+        return period
+
+class StockPeriod(models.Model):
+    """Stock Period (stckperiod) - closed periods that have balance snapshots"""
+    
+    PERIOD_TYPES = [
+        ('DAY', 'Daily'),
+        ('MON', 'Monthly'),
+    ]
+    
+    period_end = models.DateField(
+        unique=True,
+        help_text="Last day included in the period"
+    )
+    period_type = models.CharField(
+        max_length=3,
+        choices=PERIOD_TYPES,
+        help_text="Period granularity"
+    )
+    closed_at = models.DateTimeField(auto_now_add=True)
+    
+    objects = StockPeriodManager()
+    
+    class Meta:
+        db_table = 'stckperiod'
+        verbose_name = 'Stock Period'
+        verbose_name_plural = 'Stock Periods'
+        ordering = ['-period_end']
+    
+    def __str__(self):
+        return f"{self.get_period_type_display()} close {self.period_end}"
+
+class StockSnapshot(models.Model):
+    """Stock Snapshot (stcksnap) - balance per product, location and lot at a period end"""
+    
+    period = models.ForeignKey(
+        StockPeriod,
+        on_delete=models.CASCADE,
+        related_name='snapshots',
+        help_text="Closed period"
+    )
+    product = models.ForeignKey(
+        ProductMaster,
+        on_delete=models.CASCADE,
+        related_name='snapshots',
+        help_text="Product reference"
+    )
+    location = models.CharField(
+        max_length=50,
+        blank=True,
+        default='',
+        help_text="Storage location"
+    )
+    lot_batch_number = models.CharField(
+        max_length=50,
+        blank=True,
+        default='',
+        help_text="Lot or batch number"
+    )
+    quantity = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        default=0,
+        help_text="Quantity at period end"
+    )
+    
+    class Meta:
+        db_table = 'stcksnap'
+        verbose_name = 'Stock Snapshot'
+        verbose_name_plural = 'Stock Snapshots'
+        ordering = ['period', 'product']
+        unique_together = [['period', 'product', 'location', 'lot_batch_number']]
+        indexes = [
+            models.Index(fields=['product', 'period'], name='stcksnap_product_period_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.stock_main.transaction_id} - {self.product.product_code} ({self.quantity})" 
\ No newline at end of file
+        return f"{self.period.period_end} {self.product_id} ({self.quantity})"
@@ -0,0 +1,125 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class OptInKeysetPagination(PageNumberPagination):
+    """
+    Page number pagination by default; keyset (cursor) pagination on
+    (keyset_field, id), newest first, when the request sends ?pagination=cursor
+    or a ?cursor= token. Keyset pages need no COUNT(*) and no OFFSET, so deep
+    pages cost the same as the first one.
+    """
+    keyset_field = None
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    invalid_cursor_message = 'Invalid cursor'
+
+    use_keyset = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_keyset = (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.cursor_query_param in request.query_params
+        )
+        if not self.use_keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.base_url = remove_query_param(request.build_absolute_uri(), self.page_query_param)
+        page_size = self.get_page_size(request)
+        field = self.keyset_field
+
+        cursor = self.decode_cursor(request, queryset.model)
+        if cursor is None:
+            reverse = False
+            queryset = queryset.order_by(f'-{field}', '-id')
+        else:
+            value, pk, reverse = cursor
+            if reverse:
+                queryset = queryset.filter(
+                    Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': pk})
+                ).order_by(field, 'id')
+            else:
+                queryset = queryset.filter(
+                    Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk})
+                ).order_by(f'-{field}', '-id')
+
+        # One extra row tells whether another page exists in the direction of travel
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.rows = rows
+        return rows
+
+    def get_next_link(self):
+        if not self.use_keyset:
+            return super().get_next_link()
+        if not self.has_next or not self.rows:
+            return None
+        return self.encode_cursor(self.rows[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.use_keyset:
+            return super().get_previous_link()
+        if not self.has_previous or not self.rows:
+            return None
+        return self.encode_cursor(self.rows[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        if not self.use_keyset:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def encode_cursor(self, obj, reverse):
+        return replace_query_param(self.base_url, self.cursor_query_param, self.cursor_token(obj, reverse))
+
+    def cursor_token(self, obj, reverse=False):
+        """Opaque cursor positioned just past ``obj``"""
+        value = getattr(obj, self.keyset_field)
+        value = value.isoformat() if hasattr(value, 'isoformat') else value
+        return base64.urlsafe_b64encode(
+            json.dumps([value, obj.pk, reverse]).encode('ascii')
+        ).decode('ascii')
+
+    def decode_cursor(self, request, model):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+
+        try:
+            value, pk, reverse = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+            value = model._meta.get_field(self.keyset_field).to_python(value)
+            return value, int(pk), bool(reverse)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class TransactionPagination(OptInKeysetPagination):
+    keyset_field = 'transaction_date'
+
+
+class StockDetailPagination(OptInKeysetPagination):
+    keyset_field = 'created_at'
+
+
+class InventoryReportPagination(PageNumberPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
@@ -0,0 +1,153 @@
+"""
+On-demand request profiling for staff users.
+
+A staff request carrying ?_profile=1 runs under cProfile with every SQL
+statement timed, and the result is stored in PROFILE_DIR as a pstats dump
+plus a JSON file holding the request details and SQL timeline. The profile
+id comes back in the X-Profile-Id header; ?_profile=view returns the report
+in place of the response. Other requests only pay for one query string
+lookup. Stored profiles are listed, shown and diffed with the profiles
+management command.
+"""
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from django.utils import timezone
+
+PROFILE_PARAM = '_profile'
+
+
+def profile_dir():
+    return Path(getattr(settings, 'PROFILE_DIR', settings.BASE_DIR / 'profiles'))
+
+
+class QueryTimeline:
+    """execute_wrapper that records when each statement started and how long it took
+
+    Report query threads share the request's timeline, so appends hold a lock.
+    """
+
+    def __init__(self, started):
+        self.started = started
+        self.queries = []
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            query = {
+                'start_ms': round((started - self.started) * 1000, 3),
+                'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+                'sql': sql,
+                'many': many,
+            }
+            with self._lock:
+                self.queries.append(query)
+
+
+def load_profile(profile_id):
+    """(metadata, pstats.Stats) for a stored profile; raises FileNotFoundError"""
+    directory = profile_dir()
+    with open(directory / f'{profile_id}.json') as handle:
+        metadata = json.load(handle)
+    return metadata, pstats.Stats(str(directory / f'{profile_id}.prof'))
+
+
+def stored_profiles():
+    """Metadata of every stored profile, oldest first"""
+    profiles = []
+    for path in profile_dir().glob('*.json'):
+        with open(path) as handle:
+            profiles.append(json.load(handle))
+    return sorted(profiles, key=lambda metadata: metadata['created_at'])
+
+
+def render_profile(metadata, stats, sort='cumulative', limit=40):
+    """Plain text report: request summary, top functions and the SQL timeline"""
+    out = io.StringIO()
+    out.write(
+        f"Profile {metadata['id']}: {metadata['method']} {metadata['path']} ({metadata['view']}) "
+        f"-> {metadata['status']}\n"
+        f"{metadata['duration_ms']:.1f} ms, {len(metadata['queries'])} queries, "
+        f"{sum(query['duration_ms'] for query in metadata['queries']):.1f} ms SQL\n\n"
+    )
+    stats.stream = out
+    stats.sort_stats(sort).print_stats(limit)
+    out.write('SQL timeline (start ms, duration ms):\n')
+    for query in metadata['queries']:
+        out.write(f"{query['start_ms']:>10.1f} {query['duration_ms']:>9.2f}  {query['sql'][:500]}\n")
+    return out.getvalue()
+
+
+class ProfilingMiddleware:
+    """Profile staff requests that ask for it; must come after AuthenticationMiddleware"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'PROFILING_ENABLED', True)
+        self.max_profiles = getattr(settings, 'PROFILE_MAX_FILES', 200)
+
+    def __call__(self, request):
+        mode = request.GET.get(PROFILE_PARAM) if self.enabled else None
+        if not mode or not getattr(request, 'user', None) or not request.user.is_staff:
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        timeline = QueryTimeline(started)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timeline))
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        duration = time.perf_counter() - started
+
+        metadata = self.store(request, response, profiler, duration, timeline)
+        if mode == 'view':
+            return HttpResponse(
+                render_profile(metadata, pstats.Stats(profiler)), content_type='text/plain; charset=utf-8'
+            )
+        response['X-Profile-Id'] = metadata['id']
+        return response
+
+    def store(self, request, response, profiler, duration, timeline):
+        now = timezone.now()
+        match = request.resolver_match
+        metadata = {
+            'id': f'{now:%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}',
+            'created_at': now.isoformat(),
+            'method': request.method,
+            'path': request.get_full_path(),
+            'view': (match.view_name or match._func_path) if match else 'unresolved',
+            'user': request.user.get_username(),
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 3),
+            'queries': timeline.queries,
+        }
+
+        directory = profile_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(str(directory / f"{metadata['id']}.prof"))
+        with open(directory / f"{metadata['id']}.json", 'w') as handle:
+            json.dump(metadata, handle, indent=2)
+
+        # Keep only the newest profiles
+        for path in sorted(directory.glob('*.json'))[:-self.max_profiles or None]:
+            path.unlink(missing_ok=True)
+            path.with_suffix('.prof').unlink(missing_ok=True)
+        return metadata
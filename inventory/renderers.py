@@ -0,0 +1,74 @@
+import csv
+import io
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+
+# Rows written per chunk of a streamed export
+STREAM_CHUNK_ROWS = 500
+
+
+def _csv_line(values):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+
+class CSVRenderer(BaseRenderer):
+    """Selects CSV exports; report rows are streamed, so only error payloads are rendered here"""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not isinstance(data, dict):
+            return ''
+        return _csv_line(data.keys()) + _csv_line(data.values())
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Selects newline-delimited JSON exports"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, cls=DjangoJSONEncoder) + '\n'
+
+
+EXPORT_RENDERER_CLASSES = list(api_settings.DEFAULT_RENDERER_CLASSES) + [CSVRenderer, NDJSONRenderer]
+EXPORT_FORMATS = (CSVRenderer.format, NDJSONRenderer.format)
+
+
+def stream_rows(rows, fields, export_format):
+    """Yield a CSV or NDJSON body in chunks; the header goes out before the query runs"""
+    if export_format == CSVRenderer.format:
+        yield _csv_line(fields)
+
+    chunk = []
+    for row in rows:
+        if export_format == CSVRenderer.format:
+            chunk.append(_csv_line([row[field] for field in fields]))
+        else:
+            chunk.append(json.dumps({field: row[field] for field in fields}, cls=DjangoJSONEncoder) + '\n')
+
+        if len(chunk) >= STREAM_CHUNK_ROWS:
+            yield ''.join(chunk)
+            chunk = []
+
+    if chunk:
+        yield ''.join(chunk)
+
+
+def streaming_export(rows, fields, export_format, filename):
+    """StreamingHttpResponse for an export of ``rows`` (an iterable of dicts)"""
+    renderer = CSVRenderer if export_format == CSVRenderer.format else NDJSONRenderer
+    response = StreamingHttpResponse(
+        stream_rows(rows, fields, export_format),
+        content_type=f'{renderer.media_type}; charset={renderer.charset}'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
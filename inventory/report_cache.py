@@ -0,0 +1,91 @@
+"""
+Ledger-versioned result cache for report endpoints.
+"""
+import functools
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+from .models import LedgerVersion
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def get_report_cache():
+    return caches[getattr(settings, 'REPORT_CACHE_ALIAS', 'default')]
+
+
+def _record(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def cache_stats():
+    """Hit/miss counters for this worker process"""
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else 0,
+    }
+
+
+def _bump():
+    LedgerVersion.objects.bump()
+
+
+def bump_ledger_version():
+    """Bump the ledger version once the current transaction commits"""
+    connection = transaction.get_connection()
+    if connection.in_atomic_block:
+        # Several writes in one transaction only need a single bump
+        if any(func is _bump for _, func, _ in connection.run_on_commit):
+            return
+    # A failed bump must not turn an already committed write into an error response
+    transaction.on_commit(_bump, robust=True)
+
+
+def report_cache_key(endpoint, params, version, media_format=''):
+    normalized = f'format={media_format}|' + '&'.join(
+        f'{key}={value}'
+        for key, values in sorted(params.lists())
+        for value in sorted(values)
+    )
+    digest = hashlib.md5(normalized.encode('utf-8')).hexdigest()
+    return f'report:{endpoint}:{version}:{digest}'
+
+
+def cached_report(view_method):
+    """Serve a report action's response data from the ledger-versioned cache"""
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        endpoint = f'{self.basename}.{view_method.__name__}'
+        if kwargs:
+            endpoint += ':' + ','.join(f'{key}={value}' for key, value in sorted(kwargs.items()))
+        # The same data renders differently as JSON, CSV or NDJSON, so the negotiated format is part of the key
+        key = report_cache_key(
+            endpoint, request.query_params, LedgerVersion.objects.current(),
+            request.accepted_renderer.format
+        )
+        
+        cache = get_report_cache()
+        data = cache.get(key)
+        if data is not None:
+            _record('hits')
+            return Response(data)
+        
+        _record('misses')
+        response = view_method(self, request, *args, **kwargs)
+        # Streamed exports are never materialized, so there is nothing to cache
+        if response.status_code == 200 and isinstance(response, Response):
+            cache.set(key, response.data, getattr(settings, 'REPORT_CACHE_TIMEOUT', 300))
+        return response
+    
+    return wrapper
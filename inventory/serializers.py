@@ -1,8 +1,12 @@
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import prefetch_related_objects
 from django.utils import timezone
+from django.utils.functional import cached_property
 from decimal import Decimal
-from .models import ProductMaster, StockMain, StockDetail
+from .models import ProductMaster, StockMain, StockDetail, post_ledger_lines
 
 class ProductMasterSerializer(serializers.ModelSerializer):
     current_stock = serializers.ReadOnlyField()
@@ -66,7 +70,127 @@ class ProductMasterSerializer(serializers.ModelSerializer):
         
         return data
 
+class ProductUpsertSerializer(ProductMasterSerializer):
+    """Product row for bulk writes keyed on product code"""
+    
+    class Meta(ProductMasterSerializer.Meta):
+        fields = [
+            'product_code', 'product_name', 'description', 'category',
+            'unit_of_measure', 'minimum_stock_level', 'maximum_stock_level',
+            'standard_cost', 'is_active'
+        ]
+        # Uniqueness is checked once per batch by the caller
+        extra_kwargs = {'product_code': {'validators': []}}
+    
+    def validate_product_code(self, value):
+        """Validate product code format"""
+        if not value or len(value.strip()) < 3:
+            raise serializers.ValidationError(
+                "Product code must be at least 3 characters long."
+            )
+        return value.upper().strip()
+    
+    def validate_row(self, row, partial=False):
+        """Validated data for one row, with only the keys it sent; partial rows skip required checks
+        
+        A lighter path than run_validation for large batches: each sent field is validated
+        directly, and repeated values of a field (categories, units, levels) only once.
+        """
+        if not isinstance(row, dict):
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    self.error_messages['invalid'].format(datatype=type(row).__name__)
+                ]
+            }, code='invalid')
+        
+        data, errors = {}, {}
+        for name, field in self.row_fields.items():
+            try:
+                if name in row:
+                    data[name] = self.validate_field(name, field, row[name])
+                elif field.required and not partial:
+                    field.fail('required')
+            except serializers.ValidationError as exc:
+                errors[name] = exc.detail
+        if errors:
+            raise serializers.ValidationError(errors)
+        
+        try:
+            return self.validate(data)
+        except (serializers.ValidationError, ValidationError) as exc:
+            raise serializers.ValidationError(detail=serializers.as_serializer_error(exc))
+    
+    @cached_property
+    def row_fields(self):
+        return {name: field for name, field in self.fields.items() if not field.read_only}
+    
+    def validate_field(self, name, field, value):
+        """One field's validated value, memoized per serializer on the field and raw value"""
+        key = (name, type(value), value)
+        try:
+            result = self._field_results.get(key)
+        except TypeError:
+            # Lists and dicts are not hashable and are not worth caching
+            key = result = None
+        if result is None:
+            try:
+                result = field.run_validation(value)
+                validate_method = getattr(self, f'validate_{name}', None)
+                if validate_method:
+                    result = validate_method(result)
+            except (serializers.ValidationError, ValidationError) as exc:
+                result = serializers.ValidationError(
+                    exc.detail if isinstance(exc, serializers.ValidationError) else serializers.get_error_detail(exc)
+                )
+            if key is not None:
+                self._field_results[key] = result
+        if isinstance(result, serializers.ValidationError):
+            raise result
+        return result
+    
+    @cached_property
+    def _field_results(self):
+        return {}
+
+class ProductImportSerializer(ProductUpsertSerializer):
+    """Product row with optional opening stock, for bulk loads"""
+    opening_quantity = serializers.DecimalField(
+        max_digits=12, decimal_places=2, min_value=Decimal('0.00'), required=False, default=Decimal('0.00')
+    )
+    unit_cost = serializers.DecimalField(
+        max_digits=12, decimal_places=2, min_value=Decimal('0.00'), required=False, allow_null=True
+    )
+    location = serializers.CharField(max_length=50, required=False, allow_blank=True)
+    lot_batch_number = serializers.CharField(max_length=50, required=False, allow_blank=True)
+    expiry_date = serializers.DateField(required=False, allow_null=True)
+    
+    class Meta(ProductUpsertSerializer.Meta):
+        fields = ProductUpsertSerializer.Meta.fields + [
+            'opening_quantity', 'unit_cost', 'location', 'lot_batch_number', 'expiry_date'
+        ]
+    
+    def validate_expiry_date(self, value):
+        """Validate expiry date"""
+        if value and value < timezone.now().date():
+            raise serializers.ValidationError(
+                "Expiry date cannot be in the past."
+            )
+        return value
+
+class ProductLookupField(serializers.PrimaryKeyRelatedField):
+    """Product reference resolved from a prefetched ``products`` map in the context when one is given"""
+    
+    def to_internal_value(self, data):
+        products = self.context.get('products')
+        if products is not None:
+            try:
+                return products[int(data)]
+            except (KeyError, TypeError, ValueError):
+                pass
+        return super().to_internal_value(data)
+
 class StockDetailSerializer(serializers.ModelSerializer):
+    product = ProductLookupField(queryset=ProductMaster.objects.all())
     product_name = serializers.CharField(source='product.product_name', read_only=True)
     product_code = serializers.CharField(source='product.product_code', read_only=True)
     unit_of_measure = serializers.CharField(source='product.unit_of_measure', read_only=True)
@@ -76,7 +200,7 @@ class StockDetailSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'product', 'product_name', 'product_code', 'unit_of_measure',
             'quantity', 'unit_cost', 'total_cost', 'lot_batch_number', 
-            'expiry_date', 'location', 'remarks', 'created_at', 'updated_at'
+            'expiry_date', 'location', 'destination_location', 'remarks', 'created_at', 'updated_at'
         ]
         read_only_fields = ['total_cost', 'created_at', 'updated_at']
     
@@ -194,18 +318,45 @@ class StockMainCreateSerializer(serializers.ModelSerializer):
         
         return value
     
+    def validate(self, data):
+        """Transfers need a destination that differs from the source location"""
+        if data.get('transaction_type') == 'TRF':
+            for detail in data.get('stock_details', []):
+                if not detail.get('destination_location'):
+                    raise serializers.ValidationError({
+                        'stock_details': 'Transfers require a destination_location on every line.'
+                    })
+                if (detail.get('location') or '') == detail['destination_location']:
+                    raise serializers.ValidationError({
+                        'stock_details': 'Transfer destination must differ from the source location.'
+                    })
+        
+        return data
+    
+    @transaction.atomic
     def create(self, validated_data):
         """Create stock main with details"""
         stock_details_data = validated_data.pop('stock_details')
+        
+        details = [StockDetail(**detail_data) for detail_data in stock_details_data]
+        for detail in details:
+            detail.total_cost = detail.quantity * detail.unit_cost
+        
+        # The header total is known up front, so the header is written once
+        validated_data['total_amount'] = sum((detail.total_cost for detail in details), Decimal('0'))
         stock_main = StockMain.objects.create(**validated_data)
         
-        for detail_data in stock_details_data:
-            StockDetail.objects.create(stock_main=stock_main, **detail_data)
+        # Insert all lines at once instead of one StockDetail.save per line
+        for detail in details:
+            detail.stock_main = stock_main
+        StockDetail.objects.bulk_create(details)
+        post_ledger_lines(details)
         
         return stock_main
     
     def to_representation(self, instance):
         """Return full representation after creation"""
+        prefetch_related_objects([instance], 'stock_details__product')
         return StockMainSerializer(instance, context=self.context).data
 
 class InventoryReportSerializer(serializers.Serializer):
@@ -0,0 +1,76 @@
+import threading
+from contextlib import contextmanager
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import (
+    ProductMaster, StockMain, StockDetail, DailyTransactionRollup, StockPeriod,
+    apply_ledger_lines, ledger_date
+)
+from .report_cache import bump_ledger_version
+
+_deletes = threading.local()
+
+
+@contextmanager
+def deletes_rebuilt_afterwards():
+    """Skip the per-row balance, rollup and period upkeep of deletes made in this thread
+    
+    For bulk deletes whose caller rebuilds the derived tables, and invalidates the closed
+    periods, once it is done.
+    """
+    _deletes.rebuilt_afterwards = True
+    try:
+        yield
+    finally:
+        _deletes.rebuilt_afterwards = False
+
+
+@receiver(post_delete, sender=StockDetail)
+def reverse_stock_balance(sender, instance, **kwargs):
+    """Take a deleted line out of the stock and lot balances"""
+    if getattr(_deletes, 'rebuilt_afterwards', False):
+        return
+    
+    # A signal rather than StockDetail.delete() so cascades and queryset deletes are covered
+    stock_main_id, (*values, quantity) = getattr(
+        instance, '_loaded_ledger', None
+    ) or instance.ledger_state()
+    header = StockMain.objects.filter(
+        pk=stock_main_id
+    ).values_list('transaction_type', 'transaction_date').first()
+    if header is None:
+        return
+    transaction_type, transaction_date = header
+    
+    # Rows are never recreated here: a product being deleted takes its balances with it
+    apply_ledger_lines(
+        [(transaction_type, *values, -quantity)],
+        create_missing=False
+    )
+    StockPeriod.objects.invalidate_from(ledger_date(transaction_date))
+
+
+@receiver(post_delete, sender=StockMain)
+def remove_from_daily_rollup(sender, instance, **kwargs):
+    """Take a deleted header out of its daily rollup bucket"""
+    if getattr(_deletes, 'rebuilt_afterwards', False):
+        return
+    
+    bucket, amount = getattr(instance, '_loaded_rollup', None) or instance.rollup_entry()
+    DailyTransactionRollup.objects.apply_on_commit([(bucket, amount, -1)])
+    
+    # Snapshots taken after this header's date included its lines
+    StockPeriod.objects.invalidate_from(bucket[0])
+
+
+@receiver(post_save, sender=ProductMaster)
+@receiver(post_save, sender=StockMain)
+@receiver(post_save, sender=StockDetail)
+@receiver(post_delete, sender=ProductMaster)
+@receiver(post_delete, sender=StockMain)
+@receiver(post_delete, sender=StockDetail)
+def invalidate_reports(sender, **kwargs):
+    """Move cached reports to a new ledger version after any stock data write"""
+    bump_ledger_version()
@@ -0,0 +1,73 @@
+from decimal import Decimal
+
+from django.test import Client, TestCase
+
+from inventory.models import ProductMaster
+
+
+class BulkUpsertTests(TestCase):
+    url = '/api/products/bulk_upsert/'
+
+    def setUp(self):
+        self.client = Client(SERVER_NAME='localhost')
+        self.product = ProductMaster.objects.create(
+            product_code='KEEP01', product_name='Kept product', description='Original description',
+            category='RAW', unit_of_measure='KG', minimum_stock_level=Decimal('5'),
+            maximum_stock_level=Decimal('50'), standard_cost=Decimal('12.50'), is_active=False
+        )
+
+    def upsert(self, rows):
+        response = self.client.post(self.url, rows, content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_partial_row_keeps_omitted_fields(self):
+        result = self.upsert([{'product_code': 'keep01', 'product_name': 'Renamed product'}])
+
+        self.assertEqual((result['created'], result['updated'], result['errors']), (0, 1, 0))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.product_name, 'Renamed product')
+        self.assertEqual(self.product.description, 'Original description')
+        self.assertEqual(self.product.category, 'RAW')
+        self.assertEqual(self.product.unit_of_measure, 'KG')
+        self.assertEqual(self.product.minimum_stock_level, Decimal('5'))
+        self.assertEqual(self.product.maximum_stock_level, Decimal('50'))
+        self.assertEqual(self.product.standard_cost, Decimal('12.50'))
+        self.assertFalse(self.product.is_active)
+
+    def test_rows_sending_different_fields_in_one_batch(self):
+        result = self.upsert([
+            {'product_code': 'KEEP01', 'standard_cost': '20.00'},
+            {'product_code': 'NEW001', 'product_name': 'New product'},
+        ])
+
+        self.assertEqual((result['created'], result['updated'], result['errors']), (1, 1, 0))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.standard_cost, Decimal('20.00'))
+        self.assertEqual(self.product.product_name, 'Kept product')
+        self.assertEqual(self.product.category, 'RAW')
+        # New products still get the model defaults for what they leave out
+        created = ProductMaster.objects.get(product_code='NEW001')
+        self.assertEqual(created.category, 'FIN')
+        self.assertTrue(created.is_active)
+
+    def test_new_products_still_require_their_fields(self):
+        result = self.upsert([{'product_code': 'NEW002'}, {'product_code': 'KEEP01'}])
+
+        self.assertEqual((result['created'], result['updated'], result['errors']), (0, 1, 1))
+        self.assertEqual(result['results'][0]['errors'], {'product_name': ['This field is required.']})
+        self.assertFalse(ProductMaster.objects.filter(product_code='NEW002').exists())
+
+    def test_invalid_rows_are_reported_per_row(self):
+        result = self.upsert([
+            {'product_code': 'KEEP01', 'standard_cost': '-1'},
+            'not a row',
+            {'product_code': 'NEW003', 'product_name': 'Levels', 'minimum_stock_level': '9', 'maximum_stock_level': '3'},
+        ])
+
+        self.assertEqual(result['errors'], 3)
+        self.assertIn('standard_cost', result['results'][0]['errors'])
+        self.assertIn('non_field_errors', result['results'][1]['errors'])
+        self.assertIn('minimum_stock_level', result['results'][2]['errors'])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.standard_cost, Decimal('12.50'))
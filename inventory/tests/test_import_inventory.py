@@ -0,0 +1,39 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from inventory.models import ProductMaster
+
+
+class ImportResumeTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'products.csv')
+        self.write_rows(['IMP001', 'IMP002'])
+
+    def write_rows(self, codes):
+        with open(self.path, 'w') as f:
+            f.write('product_code,product_name\n')
+            f.writelines(f'{code},Imported {code}\n' for code in codes)
+
+    def run_import(self, **options):
+        call_command('import_inventory', self.path, batch_size=1, stdout=StringIO(), **options)
+
+    def test_resume_skips_the_committed_rows(self):
+        self.run_import()
+        ProductMaster.objects.filter(product_code='IMP002').delete()
+
+        self.run_import(resume=True)
+        self.assertFalse(ProductMaster.objects.filter(product_code='IMP002').exists())
+
+    def test_resume_refuses_a_changed_file(self):
+        self.run_import()
+        self.write_rows(['IMP001', 'IMP002', 'IMP003'])
+
+        with self.assertRaisesMessage(CommandError, 'different or modified file'):
+            self.run_import(resume=True)
+        self.assertFalse(ProductMaster.objects.filter(product_code='IMP003').exists())
@@ -0,0 +1,157 @@
+"""
+Query budgets for the API and admin.
+
+Every endpoint is requested at two data sizes. Its query count must not grow
+with the data (no N+1) and must stay within a budget built from what the
+endpoint is expected to run.
+"""
+import re
+from collections import Counter
+from io import StringIO
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from inventory.management.commands.bench_api import api_endpoints
+from inventory.metrics import normalize_sql
+from inventory.report_cache import get_report_cache
+
+SMALL, LARGE = 10, 1000
+
+# Captured SQL has its parameters inlined; literals are collapsed so repeated statements group together
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+# Building blocks of the budgets below
+CONDITIONAL = 1    # ledger version and timestamp for the ETag / Last-Modified check
+REPORT_CACHE = 1   # ledger version for the report cache key
+PAGE = 2           # COUNT(*) and the page itself
+TRANSACTION_LINES = 2  # prefetched lines of the listed transactions, and their products
+SESSION = 2        # session and user of the logged-in admin
+CHANGELIST = 3     # filtered count, full count and the page
+
+API_QUERY_BUDGETS = {
+    'products list': CONDITIONAL + PAGE,
+    'products detail': CONDITIONAL + 1,
+    'products low-stock-alert': CONDITIONAL + REPORT_CACHE + 1,
+    # The product, then its unexpired lots with a running total
+    'products pick-suggestion': CONDITIONAL + 1 + 1,
+    # The product, then its ledger with window balances
+    'products stock-movements': CONDITIONAL + REPORT_CACHE + 1 + 1,
+    'transactions list': CONDITIONAL + PAGE + TRANSACTION_LINES,
+    'transactions detail': CONDITIONAL + 1 + TRANSACTION_LINES,
+    'transactions transaction-summary': CONDITIONAL + REPORT_CACHE + 1,
+    'stock-details list': CONDITIONAL + PAGE,
+    'stock-details detail': CONDITIONAL + 1,
+    # Exempt from conditional GET; reads the ledger version only
+    'reports cache-stats': 1,
+    # Rows with window totals in one statement
+    'reports current-inventory': CONDITIONAL + REPORT_CACHE + 1,
+    # Exempt from conditional GET; active products, transactions, low stock, stock value, recent and pending
+    'reports dashboard-stats': REPORT_CACHE + 6,
+    'reports location-inventory': CONDITIONAL + REPORT_CACHE + 1,
+    # Opening balances, then a page of the movements in the range
+    'reports stock-movement-report': CONDITIONAL + REPORT_CACHE + 1 + PAGE,
+}
+
+ADMIN_QUERY_BUDGETS = {
+    'inventory.productmaster': SESSION + CHANGELIST,
+    'inventory.stockmain': SESSION + CHANGELIST,
+    # Plus the distinct locations for the location filter
+    'inventory.stockdetail': SESSION + CHANGELIST + 1,
+}
+
+
+def statement(sql):
+    return normalize_sql(_LITERAL.sub('%s', sql))
+
+
+def seed(size):
+    call_command('seed_benchmark', products=size, transactions=size, clear=True, stdout=StringIO())
+
+
+class QueryBudgetMixin:
+    def measure(self, client, url, params=None):
+        # The first request warms per-process caches such as content types
+        get_report_cache().clear()
+        client.get(url, params)
+        get_report_cache().clear()
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url, params)
+        self.assertLess(response.status_code, 400, f'{url}: HTTP {response.status_code}')
+        return [query['sql'] for query in context.captured_queries]
+
+    def measure_at_sizes(self, client, endpoints):
+        """{name: [small queries, large queries]}; endpoints() lists (name, url, params) after each seed"""
+        results = {}
+        for size in (SMALL, LARGE):
+            seed(size)
+            for name, url, params in endpoints():
+                results.setdefault(name, []).append(self.measure(client, url, params))
+        return results
+
+    def assertWithinBudget(self, name, small, large, budget):
+        self.assertLessEqual(
+            len(large), len(small),
+            f'{name}: query count grows with the data ({len(small)} -> {len(large)})\n'
+            + self.describe(large, small)
+        )
+        self.assertLessEqual(
+            len(large), budget,
+            f'{name}: {len(large)} queries, budget {budget}\n' + self.describe(large, small)
+        )
+
+    def describe(self, queries, baseline):
+        """Repeated statements, or those run more often than on the small data set, else all of them"""
+        counts = Counter(statement(sql) for sql in queries)
+        before = Counter(statement(sql) for sql in baseline)
+        offending = [
+            (sql, count) for sql, count in counts.most_common()
+            if count > 1 or count > before[sql]
+        ] or counts.most_common()
+        return '\n'.join(f'  {count}x (was {before[sql]}x) {sql[:300]}' for sql, count in offending[:10])
+
+
+class ApiQueryBudgetTests(QueryBudgetMixin, TestCase):
+    def test_every_endpoint_has_a_budget(self):
+        seed(SMALL)
+        for name, _, _ in api_endpoints():
+            self.assertIn(name, API_QUERY_BUDGETS)
+
+    def test_query_counts_are_constant_and_within_budget(self):
+        client = Client(SERVER_NAME='localhost')
+        results = self.measure_at_sizes(client, api_endpoints)
+        for name, (small, large) in results.items():
+            with self.subTest(endpoint=name):
+                self.assertWithinBudget(name, small, large, API_QUERY_BUDGETS[name])
+
+
+# The manifest storage needs collectstatic, which the test run does not do
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class AdminQueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser('admin-budget', password=None)
+
+    def changelists(self):
+        return [
+            (
+                model._meta.label_lower,
+                reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist'),
+                None
+            )
+            for model in admin.site._registry if model._meta.app_label == 'inventory'
+        ]
+
+    def test_changelist_query_counts_are_constant_and_within_budget(self):
+        client = Client(SERVER_NAME='localhost')
+        client.force_login(self.user)
+        results = self.measure_at_sizes(client, self.changelists)
+        self.assertEqual(set(results), set(ADMIN_QUERY_BUDGETS))
+        for name, (small, large) in results.items():
+            with self.subTest(changelist=name):
+                self.assertWithinBudget(name, small, large, ADMIN_QUERY_BUDGETS[name])
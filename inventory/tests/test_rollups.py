@@ -0,0 +1,72 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.db import DatabaseError
+from django.test import Client, TestCase
+
+from inventory.models import DailyTransactionRollup, LedgerVersion, ProductMaster, StockMain
+from inventory.report_cache import get_report_cache
+
+
+class DailyRollupTests(TestCase):
+    summary_url = '/api/transactions/transaction_summary/'
+
+    def setUp(self):
+        # Ledger versions restart with every test's rollback, so cached reports must not outlive it
+        get_report_cache().clear()
+        self.client = Client(SERVER_NAME='localhost')
+        self.product = ProductMaster.objects.create(product_code='ROLL01', product_name='Rollup product')
+
+    def post_receipt(self, quantity='4', unit_cost='2.50'):
+        response = self.client.post('/api/transactions/', {
+            'transaction_type': 'IN',
+            'transaction_date': '2025-01-01T10:00:00Z',
+            'stock_details': [{'product': self.product.pk, 'quantity': quantity, 'unit_cost': unit_cost}],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+
+    def summary(self):
+        response = self.client.get(self.summary_url, {'start_date': '2025-01-01', 'end_date': '2025-01-01'})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def rollups(self):
+        return list(DailyTransactionRollup.objects.exclude(
+            transaction_count=0, total_amount=0
+        ).values_list('date', 'transaction_type', 'status', 'transaction_count', 'total_amount'))
+
+    def test_rollups_are_not_touched_until_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.post_receipt()
+            self.assertEqual(self.rollups(), [])
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.summary()['total_transactions'], 1)
+
+    def test_summary_cached_between_the_bump_and_the_rollup_update_is_not_served(self):
+        self.assertEqual(self.summary()['total_transactions'], 0)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.post_receipt()
+
+        # The posting's ledger bump runs first; a request arriving before the rollup update
+        # caches the old totals under the new version
+        LedgerVersion.objects.bump()
+        self.assertEqual(self.summary()['total_transactions'], 0)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.summary()['total_transactions'], 1)
+
+    def test_failed_update_recomputes_the_affected_days(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post_receipt()
+        with mock.patch.object(
+            DailyTransactionRollup.objects, 'apply_entries', side_effect=DatabaseError('lost')
+        ), self.assertLogs('inventory.models', 'ERROR'):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.post_receipt(quantity='2')
+
+        self.assertEqual(self.rollups(), [
+            (StockMain.objects.first().transaction_date.date(), 'IN', 'DRAFT', 2, Decimal('15.00'))
+        ])
+        self.assertEqual(self.summary()['total_transactions'], 2)
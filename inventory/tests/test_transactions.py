@@ -0,0 +1,112 @@
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import Sum
+from django.test import Client, TestCase, TransactionTestCase, skipUnlessDBFeature
+
+from inventory.models import LocationBalance, ProductMaster, StockBalance, StockDetail, signed_quantity
+
+
+def post_transaction(client, product, transaction_type, quantity):
+    return client.post('/api/transactions/', {
+        'transaction_type': transaction_type,
+        'transaction_date': '2025-01-02T10:00:00Z',
+        'stock_details': [{'product': product.pk, 'quantity': quantity, 'unit_cost': '1.00'}],
+    }, content_type='application/json')
+
+
+class StockOutTests(TestCase):
+    def setUp(self):
+        self.client = Client(SERVER_NAME='localhost')
+        self.product = ProductMaster.objects.create(product_code='PICK01', product_name='Picked product')
+        self.assertEqual(post_transaction(self.client, self.product, 'IN', '5').status_code, 201)
+
+    def balance(self):
+        return StockBalance.objects.get(product=self.product).quantity
+
+    def test_out_larger_than_the_balance_is_rejected(self):
+        response = post_transaction(self.client, self.product, 'OUT', '6')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.balance(), Decimal('5'))
+        self.assertFalse(StockDetail.objects.filter(stock_main__transaction_type='OUT').exists())
+
+    def test_picks_stop_at_zero(self):
+        statuses = [post_transaction(self.client, self.product, 'OUT', '2').status_code for _ in range(4)]
+
+        self.assertEqual(statuses, [201, 201, 400, 400])
+        self.assertEqual(self.balance(), Decimal('1'))
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentStockOutTests(TransactionTestCase):
+    def test_concurrent_picks_never_oversell(self):
+        product = ProductMaster.objects.create(product_code='PICK02', product_name='Contended product')
+        self.assertEqual(post_transaction(Client(SERVER_NAME='localhost'), product, 'IN', '10').status_code, 201)
+
+        def pick(_):
+            try:
+                return post_transaction(Client(SERVER_NAME='localhost'), product, 'OUT', '1').status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            statuses = list(executor.map(pick, range(30)))
+
+        self.assertEqual((statuses.count(201), statuses.count(400)), (10, 20))
+        ledger = StockDetail.objects.filter(product=product).aggregate(total=Sum(signed_quantity()))['total']
+        self.assertEqual(StockBalance.objects.get(product=product).quantity, 0)
+        self.assertEqual(ledger, 0)
+
+
+class TransactionBatchTests(TestCase):
+    url = '/api/transactions/batch/'
+
+    def setUp(self):
+        self.client = Client(SERVER_NAME='localhost')
+        self.moved = ProductMaster.objects.create(product_code='MOVE01', product_name='Moved product')
+        self.drawn = ProductMaster.objects.create(product_code='DRAW01', product_name='Drawn product')
+        self.post('/api/transactions/', self.item('IN', self.moved, '10', location='A1', unit_cost='1.00'))
+
+    def post(self, url, data):
+        return self.client.post(url, data, content_type='application/json')
+
+    def item(self, transaction_type, product, quantity, **line):
+        return {
+            'transaction_type': transaction_type,
+            'transaction_date': '2025-01-02T10:00:00Z',
+            'stock_details': [{'product': product.pk, 'quantity': quantity, **line}],
+        }
+
+    def batch(self, **extra):
+        return self.post(self.url, {
+            'transactions': [
+                self.item('TRF', self.moved, '4', location='A1', destination_location='B1'),
+                self.item('OUT', self.drawn, '4'),
+                self.item('IN', self.drawn, '3', unit_cost='1.00'),
+            ],
+            **extra,
+        })
+
+    def test_atomic_batch_rejects_everything_on_one_error(self):
+        response = self.batch()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(StockBalance.objects.filter(product=self.drawn).exists())
+
+    def test_atomic_false_as_a_string_posts_the_valid_items(self):
+        response = self.batch(atomic='false')
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual((response.json()['created'], response.json()['errors']), (2, 1))
+        self.assertEqual(StockBalance.objects.get(product=self.drawn).quantity, Decimal('3'))
+        self.assertEqual(dict(LocationBalance.objects.filter(product=self.moved).values_list('location', 'quantity')), {
+            'A1': Decimal('6'), 'B1': Decimal('4'),
+        })
+
+    def test_atomic_must_be_a_boolean(self):
+        response = self.batch(atomic='sometimes')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('atomic', response.json())
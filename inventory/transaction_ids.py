@@ -0,0 +1,87 @@
+"""
+Transaction ID allocation for StockMain.
+
+IDs keep the ``TXN<YYYYMMDD><number>`` format. Numbers start at 10000, so
+they can never collide with the older random 4-digit suffixes.
+"""
+import os
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+SEQUENCE_NAME = 'stckmain_txn_seq'
+FIRST_VALUE = 10000
+
+
+class TransactionIdAllocator:
+    """Hands out transaction numbers from a database sequence in per-process blocks"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pool = []
+        self._pid = None
+
+    @property
+    def block_size(self):
+        return getattr(settings, 'TRANSACTION_ID_BLOCK_SIZE', 50)
+
+    def allocate(self, count=1):
+        """Return ``count`` new transaction IDs"""
+        if connection.vendor == 'postgresql':
+            numbers = self._take_from_pool(count)
+        else:
+            numbers = self._take_from_counter(count)
+
+        date_prefix = timezone.now().strftime('%Y%m%d')
+        return [f"TXN{date_prefix}{number}" for number in numbers]
+
+    def _take_from_pool(self, count):
+        with self._lock:
+            # A forked worker must not reuse the block its parent was holding
+            if self._pid != os.getpid():
+                self._pool = []
+                self._pid = os.getpid()
+
+            if len(self._pool) < count:
+                self._pool.extend(self._fetch_block(max(count - len(self._pool), self.block_size)))
+
+            numbers, self._pool = self._pool[:count], self._pool[count:]
+        return numbers
+
+    def _fetch_block(self, size):
+        # nextval() is not rolled back with the surrounding transaction, so a
+        # reserved block stays unique even if the request that fetched it fails
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT nextval('{SEQUENCE_NAME}') FROM generate_series(1, %s)",
+                [size]
+            )
+            return sorted(row[0] for row in cursor.fetchall())
+
+    def _take_from_counter(self, count):
+        # Counter rows roll back with the caller's transaction, so numbers are
+        # reserved exactly as needed instead of being pooled
+        from .models import TransactionSequence
+
+        with transaction.atomic():
+            sequence = TransactionSequence.objects.filter(name=SEQUENCE_NAME)
+            if not sequence.update(last_value=F('last_value') + count):
+                TransactionSequence.objects.get_or_create(
+                    name=SEQUENCE_NAME,
+                    defaults={'last_value': FIRST_VALUE - 1}
+                )
+                sequence.update(last_value=F('last_value') + count)
+            last_value = sequence.values_list('last_value', flat=True).get()
+
+        return list(range(last_value - count + 1, last_value + 1))
+
+
+allocator = TransactionIdAllocator()
+
+
+def allocate_transaction_ids(count):
+    """Allocate ``count`` unique transaction IDs"""
+    return allocator.allocate(count)
@@ -1,26 +1,189 @@
-from rest_framework import viewsets, status, filters
+from rest_framework import viewsets, status, filters, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q, Sum, Max, F, Case, When, Value, CharField
+from django.db.models import (
+    Q, Sum, Max, Count, F, Case, When, Value, CharField, DecimalField, ExpressionWrapper, OuterRef,
+    Subquery, Window
+)
 from django.db import transaction
 from django.utils import timezone
 from datetime import datetime, timedelta
 from decimal import Decimal
+import functools
 
-from .models import ProductMaster, StockMain, StockDetail
+from .models import (
+    ProductMaster, StockMain, StockDetail, StockBalance, LocationBalance, LotBalance, LedgerVersion, DailyTransactionRollup,
+    StockPeriod, ledger_lot_deltas, post_ledger_lines, signed_quantity
+)
+from . import report_cache
+from .concurrency import run_concurrently
+from .conditional import LedgerConditionalMixin
+from .pagination import InventoryReportPagination, TransactionPagination, StockDetailPagination
+from .transaction_ids import allocate_transaction_ids
+from .renderers import EXPORT_RENDERER_CLASSES, EXPORT_FORMATS, streaming_export
+from .report_cache import bump_ledger_version, cached_report
 from .serializers import (
-    ProductMasterSerializer, StockMainSerializer, StockDetailSerializer,
+    ProductMasterSerializer, ProductUpsertSerializer, StockMainSerializer, StockDetailSerializer,
     StockMainCreateSerializer, InventoryReportSerializer, StockMovementSerializer
 )
 
-class ProductMasterViewSet(viewsets.ModelViewSet):
+# Rows fetched per database round trip when iterating large reports
+EXPORT_CHUNK_SIZE = 2000
+
+# Largest product batch accepted by bulk_upsert in one request
+BULK_UPSERT_MAX_ROWS = 10000
+
+# Most transactions accepted by one transactions/batch request
+TRANSACTION_BATCH_MAX_ITEMS = 500
+
+# current_inventory columns accepted by ?ordering=, optionally prefixed with '-'
+INVENTORY_ORDERING_FIELDS = [
+    'product_code', 'product_name', 'category', 'current_stock',
+    'stock_value', 'stock_status', 'last_transaction_date'
+]
+
+def movement_values(queryset):
+    """Ledger lines as movement rows, with each product's running balance computed in SQL"""
+    return queryset.annotate(
+        running_balance=Window(
+            expression=Sum(signed_quantity()),
+            partition_by=[F('product_id')],
+            order_by=[
+                F('stock_main__transaction_date').asc(),
+                F('stock_main_id').asc(),
+                F('id').asc(),
+            ]
+        )
+    ).values(
+        'product_id', 'quantity', 'unit_cost', 'total_cost', 'running_balance',
+        product_code=F('product__product_code'),
+        product_name=F('product__product_name'),
+        transaction_id=F('stock_main__transaction_id'),
+        transaction_date=F('stock_main__transaction_date'),
+        transaction_type=F('stock_main__transaction_type'),
+        vendor_customer=F('stock_main__vendor_customer'),
+        reference_number=F('stock_main__reference_number'),
+    )
+
+def movement_rows(rows, opening_balances=None):
+    """Finish movement rows, seeding each running balance with the product's opening balance"""
+    transaction_types = dict(StockMain.TRANSACTION_TYPES)
+    opening_balances = opening_balances or {}
+    
+    for row in rows:
+        yield {
+            **row,
+            'transaction_type_display': transaction_types.get(row['transaction_type'], row['transaction_type']),
+            'running_balance': row['running_balance'] + opening_balances.get(row['product_id'], 0),
+        }
+
+def opening_balances(start_date, product_code=None):
+    """Stock per product just before start_date: current balance less everything posted since"""
+    since = StockDetail.objects.filter(stock_main__transaction_date__date__gte=start_date)
+    if product_code:
+        since = since.filter(product__product_code=product_code)
+    
+    rows = since.values('product_id').annotate(
+        posted=Sum(signed_quantity()),
+        balance=Max('product__balance__quantity')
+    ).order_by()
+    return {row['product_id']: (row['balance'] or 0) - row['posted'] for row in rows}
+
+def low_stock(products):
+    """Active products below their minimum level; products must be annotated with current_stock"""
+    return products.filter(is_active=True, current_stock__lt=F('minimum_stock_level'))
+
+def product_movements(ledger):
+    """Movement rows of one product's ledger, latest first; the running balance window still runs oldest to newest"""
+    return movement_values(ledger.order_by('-stock_main__transaction_date', '-stock_main_id', '-id'))
+
+def movement_report_ledger(start_date, end_date, product_code=None):
+    """Ledger lines posted in a date range, ordered for the stock movement report"""
+    queryset = StockDetail.objects.filter(
+        stock_main__transaction_date__date__range=[start_date, end_date]
+    ).order_by('product__product_code', 'stock_main__transaction_date', 'stock_main_id', 'id')
+    if product_code:
+        queryset = queryset.filter(product__product_code=product_code)
+    return queryset
+
+def inventory_values(as_of=None, category=None, stock_status=None, ordering=('product_code',)):
+    """current_inventory rows, with stock, value, status and last transaction date computed in the database"""
+    last_transactions = StockDetail.objects.filter(product=OuterRef('pk'))
+    if as_of:
+        last_transactions = last_transactions.filter(stock_main__transaction_date__date__lte=as_of)
+    
+    products = ProductMaster.objects.with_stock(as_of=as_of).filter(is_active=True).annotate(
+        stock_value=ExpressionWrapper(
+            F('current_stock') * F('standard_cost'),
+            output_field=DecimalField(max_digits=15, decimal_places=2)
+        ),
+        stock_status=Case(
+            When(current_stock__lt=F('minimum_stock_level'), then=Value('LOW')),
+            When(current_stock__gt=F('maximum_stock_level'), then=Value('HIGH')),
+            default=Value('NORMAL'),
+            output_field=CharField()
+        )
+    )
+    if category:
+        products = products.filter(category=category)
+    if stock_status:
+        products = products.filter(stock_status=stock_status)
+    
+    return products.annotate(
+        last_transaction_date=Subquery(
+            last_transactions.values('product').annotate(
+                latest=Max('stock_main__transaction_date')
+            ).values('latest')
+        )
+    ).order_by(*ordering).values(
+        'product_code', 'product_name', 'category', 'unit_of_measure', 'current_stock',
+        'minimum_stock_level', 'maximum_stock_level', 'standard_cost', 'stock_value',
+        'stock_status', 'last_transaction_date'
+    )
+
+def with_inventory_totals(values):
+    """inventory_values rows carrying the report totals as window aggregates over every row
+
+    Windows are computed before a page is cut, so the totals come from the same
+    statement and snapshot as the rows.
+    """
+    return values.annotate(
+        total_products=Window(Count('id')),
+        total_stock_value=Window(Sum('stock_value')),
+        low_stock_count=Window(Count('id', filter=Q(stock_status='LOW'))),
+    )
+
+def dashboard_queries():
+    """dashboard_stats as {statistic: (queryset, function computing it from the queryset)}"""
+    products = ProductMaster.objects.with_stock().filter(is_active=True)
+    week_ago = timezone.now() - timedelta(days=7)
+    
+    def count(queryset):
+        return queryset.count()
+    
+    def stock_value(queryset):
+        return queryset.aggregate(
+            total=Sum(F('current_stock') * F('standard_cost'))
+        )['total'] or Decimal('0')
+    
+    return {
+        'total_products': (ProductMaster.objects.filter(is_active=True), count),
+        'total_transactions': (StockMain.objects.all(), count),
+        'low_stock_count': (low_stock(products), count),
+        'total_stock_value': (products, stock_value),
+        # Recent transactions (last 7 days)
+        'recent_transactions': (StockMain.objects.filter(created_at__gte=week_ago), count),
+        'pending_transactions': (StockMain.objects.filter(status='PENDING'), count),
+    }
+
+class ProductMasterViewSet(LedgerConditionalMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing Product Master records
     Provides CRUD operations and inventory-related reports
     """
-    queryset = ProductMaster.objects.all()
+    queryset = ProductMaster.objects.with_stock()
     serializer_class = ProductMasterSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['category', 'unit_of_measure', 'is_active']
@@ -29,74 +192,217 @@ class ProductMasterViewSet(viewsets.ModelViewSet):
     ordering = ['product_code']
     
     @action(detail=False, methods=['get'])
+    @cached_report
     def low_stock_alert(self, request):
         """Get products with stock below minimum level"""
-        low_stock_products = []
-        
-        for product in self.get_queryset().filter(is_active=True):
-            current_stock = product.current_stock
-            if current_stock < product.minimum_stock_level:
-                low_stock_products.append({
-                    'id': product.id,
-                    'product_code': product.product_code,
-                    'product_name': product.product_name,
-                    'current_stock': current_stock,
-                    'minimum_stock_level': product.minimum_stock_level,
-                    'shortage': product.minimum_stock_level - current_stock
-                })
+        products = low_stock(self.get_queryset())
+        
+        low_stock_products = [
+            {
+                'id': product.id,
+                'product_code': product.product_code,
+                'product_name': product.product_name,
+                'current_stock': product.current_stock,
+                'minimum_stock_level': product.minimum_stock_level,
+                'shortage': product.minimum_stock_level - product.current_stock
+            }
+            for product in products
+        ]
         
         return Response({
             'count': len(low_stock_products),
             'products': low_stock_products
         })
     
-    @action(detail=True, methods=['get'])
+    @action(detail=False, methods=['post'])
+    def bulk_upsert(self, request):
+        """Create or update a batch of products keyed on product code"""
+        rows = request.data
+        if not isinstance(rows, list) or not rows:
+            return Response({
+                'error': 'Expected a non-empty list of products'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > BULK_UPSERT_MAX_ROWS:
+            return Response({
+                'error': f'At most {BULK_UPSERT_MAX_ROWS} products per request'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # One serializer validates every row, so its fields are only built once
+        serializer = ProductUpsertSerializer()
+        code_field = serializer.row_fields['product_code']
+        
+        # Codes first: a single IN query tells creates from updates before the rows are validated
+        codes = {}
+        for index, row in enumerate(rows):
+            try:
+                codes[index] = serializer.validate_field('product_code', code_field, row['product_code'])
+            except (serializers.ValidationError, KeyError, TypeError):
+                pass
+        existing = set(
+            ProductMaster.objects.filter(
+                product_code__in=set(codes.values())
+            ).values_list('product_code', flat=True)
+        )
+        
+        results = []
+        valid = {}
+        for index, row in enumerate(rows):
+            try:
+                # Updates only carry the fields they send; defaults are for new products only
+                data = serializer.validate_row(row, partial=codes.get(index) in existing)
+            except serializers.ValidationError as exc:
+                results.append({'index': index, 'status': 'error', 'errors': exc.detail})
+                continue
+            
+            code = data['product_code']
+            if code in valid:
+                results.append({
+                    'index': index, 'product_code': code, 'status': 'error',
+                    'errors': {'product_code': ['Duplicate product code in request.']}
+                })
+                continue
+            valid[code] = data
+            results.append({'index': index, 'product_code': code})
+        existing &= set(valid)
+        
+        # Rows sending the same fields are written together, and overwrite only those fields
+        groups = {}
+        for data in valid.values():
+            groups.setdefault(tuple(sorted(data)), []).append(ProductMaster(**data))
+        
+        with transaction.atomic():
+            for fields, products in groups.items():
+                ProductMaster.objects.bulk_create(
+                    products,
+                    update_conflicts=True,
+                    unique_fields=['product_code'],
+                    update_fields=[field for field in fields if field != 'product_code'] + ['updated_at'],
+                    batch_size=1000
+                )
+            bump_ledger_version()
+        
+        for result in results:
+            if 'status' not in result:
+                result['status'] = 'updated' if result['product_code'] in existing else 'created'
+        
+        return Response({
+            'created': len(valid) - len(existing),
+            'updated': len(existing),
+            'errors': len(results) - len(valid),
+            'results': results
+        })
+    
+    @action(detail=True, methods=['get'], renderer_classes=EXPORT_RENDERER_CLASSES)
+    @cached_report
     def stock_movements(self, request, pk=None):
         """Get stock movement history for a specific product"""
         product = self.get_object()
-        
-        movements = StockDetail.objects.filter(
-            product=product
-        ).select_related('stock_main').order_by('-stock_main__transaction_date')
-        
-        # Calculate running balance
-        running_balance = Decimal('0')
-        movement_data = []
-        
-        for movement in reversed(movements):
-            if movement.stock_main.transaction_type == 'IN':
-                running_balance += movement.quantity
-            elif movement.stock_main.transaction_type == 'OUT':
-                running_balance -= movement.quantity
-            elif movement.stock_main.transaction_type == 'ADJ':
-                # For adjustments, assume quantity represents the adjustment amount
-                running_balance += movement.quantity
+        ledger = StockDetail.objects.filter(product=product)
+        opening = {}
+        
+        # As of a past date: start from the nearest snapshot and replay only what follows it
+        as_of = request.query_params.get('as_of')
+        if as_of:
+            try:
+                as_of = datetime.strptime(as_of, '%Y-%m-%d').date()
+            except ValueError:
+                return Response({
+                    'error': 'Invalid date format. Use YYYY-MM-DD'
+                }, status=status.HTTP_400_BAD_REQUEST)
             
-            movement_data.append({
-                'product_code': product.product_code,
-                'product_name': product.product_name,
-                'transaction_id': movement.stock_main.transaction_id,
-                'transaction_date': movement.stock_main.transaction_date,
-                'transaction_type': movement.stock_main.transaction_type,
-                'transaction_type_display': movement.stock_main.get_transaction_type_display(),
-                'quantity': movement.quantity,
-                'unit_cost': movement.unit_cost,
-                'total_cost': movement.total_cost,
-                'vendor_customer': movement.stock_main.vendor_customer,
-                'reference_number': movement.stock_main.reference_number,
-                'running_balance': running_balance
+            ledger = ledger.filter(stock_main__transaction_date__date__lte=as_of)
+            period = StockPeriod.objects.nearest(as_of)
+            if period:
+                ledger = ledger.filter(stock_main__transaction_date__date__gt=period.period_end)
+                opening[product.pk] = period.snapshots.filter(
+                    product=product
+                ).aggregate(total=Sum('quantity'))['total'] or 0
+        
+        movements = product_movements(ledger)
+        
+        if request.accepted_renderer.format in EXPORT_FORMATS:
+            return streaming_export(
+                movement_rows(movements.iterator(chunk_size=EXPORT_CHUNK_SIZE), opening),
+                list(StockMovementSerializer().fields),
+                request.accepted_renderer.format, f'stock_movements_{product.product_code}'
+            )
+        
+        product_data = ProductMasterSerializer(product).data
+        
+        if self.paginator.page_query_param in request.query_params:
+            page = self.paginate_queryset(movements)
+            serializer = StockMovementSerializer(list(movement_rows(page, opening)), many=True)
+            return Response({
+                'product': product_data,
+                'count': self.paginator.page.paginator.count,
+                'next': self.paginator.get_next_link(),
+                'previous': self.paginator.get_previous_link(),
+                'movements': serializer.data
             })
         
-        # Reverse to show latest first
-        movement_data.reverse()
+        serializer = StockMovementSerializer(list(movement_rows(movements, opening)), many=True)
+        response_data = {
+            'product': product_data,
+            'movements': serializer.data
+        }
+        if as_of:
+            response_data['as_of'] = {
+                'date': as_of,
+                'snapshot_date': period.period_end if period else None,
+                'opening_balance': opening.get(product.pk, 0),
+                'balance': serializer.data[0]['running_balance'] if serializer.data else opening.get(product.pk, 0)
+            }
+        return Response(response_data)
+    
+    @action(detail=True, methods=['get'])
+    def pick_suggestion(self, request, pk=None):
+        """Suggest lots to pick a quantity from, first expired first out"""
+        product = self.get_object()
+        
+        try:
+            quantity = Decimal(request.query_params.get('qty', ''))
+        except ArithmeticError:
+            quantity = None
+        if quantity is None or not quantity.is_finite() or quantity <= 0:
+            return Response({
+                'error': 'qty must be a positive number'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        lots = LotBalance.objects.filter(product=product, quantity__gt=0).filter(
+            Q(expiry_date__isnull=True) | Q(expiry_date__gte=timezone.localdate())
+        )
+        location = request.query_params.get('location')
+        if location:
+            lots = lots.filter(location=location)
+        
+        # Running total in FEFO order; only lots needed to reach qty are returned
+        fefo_order = [F('expiry_date').asc(nulls_last=True), 'lot_batch_number', 'location', 'id']
+        lots = lots.annotate(
+            cumulative=Window(Sum('quantity'), order_by=fefo_order)
+        ).filter(cumulative__lt=F('quantity') + quantity).order_by(*fefo_order)
+        
+        picks = []
+        remaining = quantity
+        for lot in lots:
+            pick_quantity = min(lot.quantity, remaining)
+            remaining -= pick_quantity
+            picks.append({
+                'lot_batch_number': lot.lot_batch_number or None,
+                'location': lot.location or None,
+                'expiry_date': lot.expiry_date,
+                'available': lot.quantity,
+                'pick_quantity': pick_quantity
+            })
         
-        serializer = StockMovementSerializer(movement_data, many=True)
         return Response({
-            'product': ProductMasterSerializer(product).data,
-            'movements': serializer.data
+            'product_code': product.product_code,
+            'requested': quantity,
+            'allocated': quantity - remaining,
+            'shortfall': remaining,
+            'picks': picks
         })
 
-class StockMainViewSet(viewsets.ModelViewSet):
+class StockMainViewSet(LedgerConditionalMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing Stock Transactions
     Provides CRUD operations for stock movements
@@ -107,6 +413,7 @@ class StockMainViewSet(viewsets.ModelViewSet):
     search_fields = ['transaction_id', 'reference_number', 'vendor_customer']
     ordering_fields = ['transaction_date', 'created_at', 'total_amount']
     ordering = ['-transaction_date', '-created_at']
+    pagination_class = TransactionPagination
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -125,10 +432,13 @@ class StockMainViewSet(viewsets.ModelViewSet):
         
         # Validate stock availability for OUT transactions
         if transaction_type == 'OUT':
+            # Hold the balance rows until commit so concurrent picks cannot oversell
+            balances = StockBalance.objects.lock([detail['product'].pk for detail in stock_details])
+            
             for detail in stock_details:
                 product = detail['product']
                 quantity = detail['quantity']
-                current_stock = product.current_stock
+                current_stock = balances.get(product.pk, 0)
                 
                 if quantity > current_stock:
                     return Response({
@@ -136,10 +446,167 @@ class StockMainViewSet(viewsets.ModelViewSet):
                                 f'Available: {current_stock}, Requested: {quantity}'
                     }, status=status.HTTP_400_BAD_REQUEST)
         
+        # Transfers draw on the source location, locked the same way
+        elif transaction_type == 'TRF':
+            balances = LocationBalance.objects.lock(
+                [(detail['product'].pk, detail.get('location') or '') for detail in stock_details]
+            )
+            
+            for detail in stock_details:
+                product = detail['product']
+                location = detail.get('location') or ''
+                available = balances.get((product.pk, location), 0)
+                
+                if detail['quantity'] > available:
+                    return Response({
+                        'error': f'Insufficient stock for product {product.product_code} '
+                                f'at location {location or "(unassigned)"}. '
+                                f'Available: {available}, Requested: {detail["quantity"]}'
+                    }, status=status.HTTP_400_BAD_REQUEST)
+        
         self.perform_create(serializer)
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
     
+    @action(detail=False, methods=['post'])
+    @transaction.atomic
+    def batch(self, request):
+        """Post many transactions in one request, all or nothing unless atomic is false"""
+        items = request.data.get('transactions') if isinstance(request.data, dict) else None
+        try:
+            # Form and query input arrive as strings, so "false" has to be parsed rather than tested
+            atomic = serializers.BooleanField().to_internal_value(
+                request.data.get('atomic', request.query_params.get('atomic', True))
+                if isinstance(request.data, dict) else request.query_params.get('atomic', True)
+            )
+        except serializers.ValidationError as exc:
+            return Response({'atomic': exc.detail}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(items, list) or not items:
+            return Response({
+                'error': 'Expected a non-empty list under "transactions"'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > TRANSACTION_BATCH_MAX_ITEMS:
+            return Response({
+                'error': f'At most {TRANSACTION_BATCH_MAX_ITEMS} transactions per request'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Every referenced product in one query; the detail serializers resolve from this map
+        product_ids = set()
+        for item in items:
+            lines = item.get('stock_details') if isinstance(item, dict) else None
+            for line in lines if isinstance(lines, list) else []:
+                if isinstance(line, dict) and str(line.get('product', '')).isdigit():
+                    product_ids.add(int(line['product']))
+        products = ProductMaster.objects.in_bulk(product_ids)
+        
+        serializer = StockMainCreateSerializer(context={**self.get_serializer_context(), 'products': products})
+        results = []
+        accepted = []
+        for index, item in enumerate(items):
+            try:
+                accepted.append((index, serializer.run_validation(item)))
+                results.append({'index': index})
+            except serializers.ValidationError as exc:
+                results.append({'index': index, 'status': 'error', 'errors': exc.detail})
+        
+        # Lock the stock balance of every product in the batch, then their location balances, the order
+        # apply_ledger_lines takes them in, and replay the batch in order against them
+        product_ids = sorted({
+            detail['product'].pk for _, data in accepted for detail in data['stock_details']
+        })
+        balances = {product_id: 0 for product_id in product_ids}
+        balances.update(StockBalance.objects.lock(product_ids))
+        drawn_locations = {
+            (detail['product'].pk, detail.get('location') or '')
+            for _, data in accepted if data['transaction_type'] == 'TRF'
+            for detail in data['stock_details']
+        }
+        location_balances = {key: 0 for key in drawn_locations}
+        location_balances.update(LocationBalance.objects.lock(
+            drawn_locations | {(product_id, '') for product_id in product_ids}
+        ))
+        posted = []
+        for index, data in accepted:
+            shortages = {}
+            for detail in data['stock_details']:
+                if data['transaction_type'] == 'OUT':
+                    available = balances[detail['product'].pk]
+                elif data['transaction_type'] == 'TRF':
+                    available = location_balances[(detail['product'].pk, detail.get('location') or '')]
+                else:
+                    continue
+                if detail['quantity'] > available:
+                    shortages[detail['product'].product_code] = (
+                        f'Insufficient stock. Available: {available}, Requested: {detail["quantity"]}'
+                    )
+            if shortages:
+                results[index].update({'status': 'error', 'errors': {'stock_details': shortages}})
+                continue
+            
+            lot_deltas, _ = ledger_lot_deltas([
+                (
+                    data['transaction_type'], detail['product'].pk, detail.get('lot_batch_number'),
+                    detail.get('location'), detail.get('destination_location'), detail.get('expiry_date'),
+                    detail['quantity']
+                )
+                for detail in data['stock_details']
+            ])
+            for (product_id, _, location), delta in lot_deltas.items():
+                if product_id in balances:
+                    balances[product_id] += delta
+                if (product_id, location) in location_balances:
+                    location_balances[(product_id, location)] += delta
+            posted.append((index, data))
+        
+        if atomic and len(posted) < len(items):
+            transaction.set_rollback(True)
+            return Response({
+                'error': 'Batch rejected; no transactions were posted',
+                'results': [result for result in results if result.get('status') == 'error']
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        headers, details = [], []
+        transaction_ids = allocate_transaction_ids(len(posted))
+        for (index, data), transaction_id in zip(posted, transaction_ids):
+            lines = [StockDetail(**detail_data) for detail_data in data['stock_details']]
+            for line in lines:
+                line.total_cost = line.quantity * line.unit_cost
+            header = StockMain(
+                transaction_id=transaction_id,
+                total_amount=sum((line.total_cost for line in lines), Decimal('0')),
+                **{field: value for field, value in data.items() if field != 'stock_details'}
+            )
+            headers.append((index, header, lines))
+        
+        StockMain.objects.bulk_create([header for _, header, _ in headers])
+        if headers and headers[0][1].pk is None:
+            ids = dict(StockMain.objects.filter(
+                transaction_id__in=transaction_ids
+            ).values_list('transaction_id', 'id'))
+            for _, header, _ in headers:
+                header.pk = ids[header.transaction_id]
+        
+        for index, header, lines in headers:
+            for line in lines:
+                line.stock_main = header
+            details.extend(lines)
+            results[index].update({'status': 'created', 'id': header.pk, 'transaction_id': header.transaction_id})
+        StockDetail.objects.bulk_create(details)
+        
+        # The bulk inserts skipped the model save hooks, so apply their effects once for the batch
+        if headers:
+            post_ledger_lines(details)
+            DailyTransactionRollup.objects.apply_on_commit(
+                [(*header.rollup_entry(), 1) for _, header, _ in headers]
+            )
+            bump_ledger_version()
+        
+        return Response({
+            'created': len(headers),
+            'errors': len(items) - len(headers),
+            'results': results
+        }, status=status.HTTP_201_CREATED if len(headers) == len(items) else status.HTTP_200_OK)
+    
     @action(detail=True, methods=['post'])
     def complete_transaction(self, request, pk=None):
         """Mark transaction as completed"""
@@ -173,6 +640,7 @@ class StockMainViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
+    @cached_report
     def transaction_summary(self, request):
         """Get transaction summary for dashboard"""
         today = timezone.now().date()
@@ -186,23 +654,12 @@ class StockMainViewSet(viewsets.ModelViewSet):
         if isinstance(end_date, str):
             end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
         
-        queryset = self.get_queryset().filter(
-            transaction_date__date__range=[start_date, end_date]
-        )
-        
-        summary = {
-            'total_transactions': queryset.count(),
-            'stock_in_transactions': queryset.filter(transaction_type='IN').count(),
-            'stock_out_transactions': queryset.filter(transaction_type='OUT').count(),
-            'adjustment_transactions': queryset.filter(transaction_type='ADJ').count(),
-            'total_value': queryset.aggregate(total=Sum('total_amount'))['total'] or 0,
-            'pending_transactions': queryset.filter(status='PENDING').count(),
-            'completed_transactions': queryset.filter(status='COMPLETED').count(),
-        }
+        # One conditional aggregate over the daily rollups instead of scanning stckmain
+        summary = DailyTransactionRollup.objects.summary(start_date, end_date)
         
         return Response(summary)
 
-class StockDetailViewSet(viewsets.ModelViewSet):
+class StockDetailViewSet(LedgerConditionalMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing Stock Detail records
     """
@@ -213,67 +670,89 @@ class StockDetailViewSet(viewsets.ModelViewSet):
     search_fields = ['product__product_code', 'product__product_name', 'lot_batch_number']
     ordering_fields = ['created_at', 'quantity', 'unit_cost']
     ordering = ['-created_at']
+    pagination_class = StockDetailPagination
 
-class InventoryReportViewSet(viewsets.ViewSet):
+class InventoryReportViewSet(LedgerConditionalMixin, viewsets.ViewSet):
     """
     ViewSet for inventory reports and analytics
     """
+    # dashboard_stats counts a rolling 7-day window that moves without any ledger write
+    conditional_exempt_actions = ('cache_stats', 'dashboard_stats')
     
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], renderer_classes=EXPORT_RENDERER_CLASSES)
+    @cached_report
     def current_inventory(self, request):
         """Get current inventory report with stock levels and values"""
-        products = ProductMaster.objects.filter(is_active=True)
+        as_of = request.query_params.get('as_of')
+        if as_of:
+            try:
+                as_of = datetime.strptime(as_of, '%Y-%m-%d').date()
+            except ValueError:
+                return Response({
+                    'error': 'Invalid date format. Use YYYY-MM-DD'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        
+        values = inventory_values(
+            as_of=as_of or None,
+            category=request.query_params.get('category'),
+            stock_status=request.query_params.get('stock_status'),
+            ordering=self._inventory_ordering(request)
+        )
         
-        inventory_data = []
-        for product in products:
-            current_stock = product.current_stock
-            stock_value = current_stock * product.standard_cost
-            
-            # Determine stock status
-            if current_stock < product.minimum_stock_level:
-                stock_status = 'LOW'
-            elif current_stock > product.maximum_stock_level:
-                stock_status = 'HIGH'
-            else:
-                stock_status = 'NORMAL'
-            
-            # Get last transaction date
-            last_transaction = StockDetail.objects.filter(
-                product=product
-            ).select_related('stock_main').order_by('-stock_main__transaction_date').first()
-            
-            inventory_data.append({
-                'product_code': product.product_code,
-                'product_name': product.product_name,
-                'category': product.get_category_display(),
-                'unit_of_measure': product.get_unit_of_measure_display(),
-                'current_stock': current_stock,
-                'minimum_stock_level': product.minimum_stock_level,
-                'maximum_stock_level': product.maximum_stock_level,
-                'standard_cost': product.standard_cost,
-                'stock_value': stock_value,
-                'stock_status': stock_status,
-                'last_transaction_date': last_transaction.stock_main.transaction_date if last_transaction else None
+        if request.accepted_renderer.format in EXPORT_FORMATS:
+            return streaming_export(
+                self._inventory_rows(values.iterator(chunk_size=EXPORT_CHUNK_SIZE)),
+                list(InventoryReportSerializer().fields),
+                request.accepted_renderer.format, 'current_inventory'
+            )
+        
+        paginator = InventoryReportPagination()
+        paginated = paginator.page_query_param in request.query_params
+        rows = with_inventory_totals(values)
+        rows = list(paginator.paginate_queryset(rows, request, view=self) if paginated else rows)
+        totals = {'total_products': 0, 'total_stock_value': Decimal('0'), 'low_stock_count': 0}
+        for row in rows:
+            # Every row carries the same totals
+            totals = {field: row.pop(field) for field in totals}
+        totals['total_stock_value'] = totals['total_stock_value'] or Decimal('0')
+        
+        serializer = InventoryReportSerializer(list(self._inventory_rows(rows)), many=True)
+        if paginated:
+            return Response({
+                **totals,
+                'count': paginator.page.paginator.count,
+                'next': paginator.get_next_link(),
+                'previous': paginator.get_previous_link(),
+                'inventory': serializer.data
             })
         
-        # Apply filters
-        category = request.query_params.get('category')
-        if category:
-            inventory_data = [item for item in inventory_data if product.category == category]
-        
-        stock_status_filter = request.query_params.get('stock_status')
-        if stock_status_filter:
-            inventory_data = [item for item in inventory_data if item['stock_status'] == stock_status_filter]
-        
-        serializer = InventoryReportSerializer(inventory_data, many=True)
         return Response({
-            'total_products': len(inventory_data),
-            'total_stock_value': sum(item['stock_value'] for item in inventory_data),
-            'low_stock_count': len([item for item in inventory_data if item['stock_status'] == 'LOW']),
+            **totals,
             'inventory': serializer.data
         })
     
-    @action(detail=False, methods=['get'])
+    def _inventory_ordering(self, request):
+        """Database ordering from ?ordering=, ignoring unknown fields, with product code as tiebreaker"""
+        ordering = [
+            field.strip() for field in request.query_params.get('ordering', '').split(',')
+            if field.strip().lstrip('-') in INVENTORY_ORDERING_FIELDS
+        ]
+        return ordering + ['product_code']
+    
+    def _inventory_rows(self, rows):
+        """Inventory report rows with category and unit labels"""
+        categories = dict(ProductMaster.PRODUCT_CATEGORIES)
+        units = dict(ProductMaster.UNIT_CHOICES)
+        
+        for row in rows:
+            yield {
+                **row,
+                'category': categories.get(row['category'], row['category']),
+                'unit_of_measure': units.get(row['unit_of_measure'], row['unit_of_measure']),
+            }
+    
+    @action(detail=False, methods=['get'], renderer_classes=EXPORT_RENDERER_CLASSES)
+    @cached_report
     def stock_movement_report(self, request):
         """Get stock movement report for a date range"""
         # Get date range from query params
@@ -294,72 +773,83 @@ class InventoryReportViewSet(viewsets.ViewSet):
                 'error': 'Invalid date format. Use YYYY-MM-DD'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Build queryset
-        queryset = StockDetail.objects.filter(
-            stock_main__transaction_date__date__range=[start_date, end_date]
-        ).select_related('stock_main', 'product').order_by('product__product_code', 'stock_main__transaction_date')
-        
-        if product_code:
-            queryset = queryset.filter(product__product_code=product_code)
-        
-        # Process movements
-        movements = []
-        for movement in queryset:
-            movements.append({
-                'product_code': movement.product.product_code,
-                'product_name': movement.product.product_name,
-                'transaction_id': movement.stock_main.transaction_id,
-                'transaction_date': movement.stock_main.transaction_date,
-                'transaction_type': movement.stock_main.transaction_type,
-                'transaction_type_display': movement.stock_main.get_transaction_type_display(),
-                'quantity': movement.quantity,
-                'unit_cost': movement.unit_cost,
-                'total_cost': movement.total_cost,
-                'vendor_customer': movement.stock_main.vendor_customer,
-                'reference_number': movement.stock_main.reference_number,
-                'running_balance': 0  # This would need to be calculated properly
-            })
-        
-        serializer = StockMovementSerializer(movements, many=True)
+        # Window sums run per product within the range, seeded with the balance at its start
+        values = movement_values(movement_report_ledger(start_date, end_date, product_code))
+        opening = opening_balances(start_date, product_code)
+        
+        if request.accepted_renderer.format in EXPORT_FORMATS:
+            return streaming_export(
+                movement_rows(values.iterator(chunk_size=EXPORT_CHUNK_SIZE), opening),
+                list(StockMovementSerializer().fields),
+                request.accepted_renderer.format, f'stock_movements_{start_date}_{end_date}'
+            )
+        
+        # A range can hold any number of lines, so JSON is always paged; the exports stream the lot
+        paginator = InventoryReportPagination()
+        page = paginator.paginate_queryset(values, request, view=self)
+        serializer = StockMovementSerializer(list(movement_rows(page, opening)), many=True)
         return Response({
             'date_range': {
                 'start_date': start_date,
                 'end_date': end_date
             },
-            'total_movements': len(movements),
+            'total_movements': paginator.page.paginator.count,
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
             'movements': serializer.data
         })
     
     @action(detail=False, methods=['get'])
+    @cached_report
+    def location_inventory(self, request):
+        """Get stock on hand per location, read from the location balance index"""
+        balances = LocationBalance.objects.exclude(quantity=0).select_related('product')
+        
+        location = request.query_params.get('location')
+        if location:
+            balances = balances.filter(location=location)
+        product_code = request.query_params.get('product_code')
+        if product_code:
+            balances = balances.filter(product__product_code=product_code.upper())
+        
+        locations = {}
+        for balance in balances.order_by('location', 'product__product_code'):
+            entry = locations.setdefault(balance.location, {
+                'location': balance.location or None,
+                'product_count': 0,
+                'total_quantity': Decimal('0'),
+                'products': []
+            })
+            entry['product_count'] += 1
+            entry['total_quantity'] += balance.quantity
+            entry['products'].append({
+                'product_code': balance.product.product_code,
+                'product_name': balance.product.product_name,
+                'unit_of_measure': balance.product.unit_of_measure,
+                'quantity': balance.quantity
+            })
+        
+        return Response({
+            'location_count': len(locations),
+            'locations': list(locations.values())
+        })
+    
+    @action(detail=False, methods=['get'])
+    @cached_report
     def dashboard_stats(self, request):
         """Get dashboard statistics"""
-        total_products = ProductMaster.objects.filter(is_active=True).count()
-        total_transactions = StockMain.objects.count()
-        
-        # Low stock products
-        low_stock_count = 0
-        total_stock_value = Decimal('0')
-        
-        for product in ProductMaster.objects.filter(is_active=True):
-            current_stock = product.current_stock
-            if current_stock < product.minimum_stock_level:
-                low_stock_count += 1
-            total_stock_value += current_stock * product.standard_cost
-        
-        # Recent transactions (last 7 days)
-        week_ago = timezone.now() - timedelta(days=7)
-        recent_transactions = StockMain.objects.filter(
-            created_at__gte=week_ago
-        ).count()
-        
-        # Pending transactions
-        pending_transactions = StockMain.objects.filter(status='PENDING').count()
+        # The statistics are independent, so they run side by side
+        stats = run_concurrently({
+            name: functools.partial(compute, queryset)
+            for name, (queryset, compute) in dashboard_queries().items()
+        })
         
+        return Response(stats)
+    
+    @action(detail=False, methods=['get'])
+    def cache_stats(self, request):
+        """Get report cache hit/miss counters for this worker"""
         return Response({
-            'total_products': total_products,
-            'total_transactions': total_transactions,
-            'low_stock_count': low_stock_count,
-            'total_stock_value': total_stock_value,
-            'recent_transactions': recent_transactions,
-            'pending_transactions': pending_transactions
-        }) 
\ No newline at end of file
+            **report_cache.cache_stats(),
+            'ledger_version': LedgerVersion.objects.current()
+        })
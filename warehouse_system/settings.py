@@ -35,6 +35,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'inventory.metrics.QueryMetricsMiddleware',  # Per-view latency and SQL metrics, served at /metrics
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # For static files in production
@@ -42,6 +43,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'inventory.profiling.ProfilingMiddleware',  # Staff-only ?_profile=1 request profiling
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -75,7 +77,8 @@ if DATABASE_URL:
     try:
         import dj_database_url
         DATABASES = {
-            'default': dj_database_url.parse(DATABASE_URL)
+            # Report query threads keep their connections between requests; check them before reuse
+            'default': dj_database_url.parse(DATABASE_URL, conn_health_checks=True)
         }
     except ImportError:
         # Fallback if dj_database_url is not available
@@ -94,6 +97,45 @@ else:
         }
     }
 
+# Cache
+# Report results are cached per worker process and invalidated by the ledger version
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'warehouse-default',
+    },
+    'reports': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'warehouse-reports',
+        'OPTIONS': {
+            # Least recently used entries are culled beyond this size
+            'MAX_ENTRIES': config('REPORT_CACHE_MAX_ENTRIES', default=500, cast=int),
+        },
+    },
+}
+
+REPORT_CACHE_ALIAS = 'reports'
+REPORT_CACHE_TIMEOUT = config('REPORT_CACHE_TIMEOUT', default=300, cast=int)
+
+# Transaction IDs reserved per worker process at a time (PostgreSQL sequence)
+TRANSACTION_ID_BLOCK_SIZE = config('TRANSACTION_ID_BLOCK_SIZE', default=50, cast=int)
+
+# Threads per process that run a report's independent queries concurrently (1 runs them in order)
+REPORT_QUERY_WORKERS = config('REPORT_QUERY_WORKERS', default=4, cast=int)
+
+# Default period closed by close_stock_periods (daily or monthly)
+STOCK_PERIOD = config('STOCK_PERIOD', default='monthly')
+
+# Request metrics; requests slower or chattier than these are logged with their repeated SQL
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+METRICS_SLOW_REQUEST_MS = config('METRICS_SLOW_REQUEST_MS', default=500, cast=int)
+METRICS_SLOW_QUERY_COUNT = config('METRICS_SLOW_QUERY_COUNT', default=100, cast=int)
+
+# Staff-only request profiling; the newest PROFILE_MAX_FILES profiles are kept in PROFILE_DIR
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=True, cast=bool)
+PROFILE_DIR = config('PROFILE_DIR', default=str(BASE_DIR / 'profiles'))
+PROFILE_MAX_FILES = config('PROFILE_MAX_FILES', default=200, cast=int)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
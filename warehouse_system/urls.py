@@ -5,11 +5,13 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from inventory.metrics import metrics_view
 from inventory.urls import api_urlpatterns, web_urlpatterns
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include(api_urlpatterns)),
+    path('metrics', metrics_view, name='metrics'),
     path('', include(web_urlpatterns)),
 ]
 